@@ -1,21 +1,253 @@
+import json
 import math
+import os
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
-# Función para cargar y normalizar la base de datos
-@st.cache_data
-def load_data():
-    df = pd.read_parquet("uy_procurements.parquet")
-    if "awarded_firm_country_name" in df.columns:
-        df["awarded_firm_country_name"] = df["awarded_firm_country_name"].astype(str).str.strip().str.title()
-    if "operation_country_name" in df.columns:
-        df["operation_country_name"] = df["operation_country_name"].astype(str).str.strip().str.title()
-    return df
+import uydata
+import uyperf
+import uyquery
 
-data = load_data()
+# Recursos compartidos por todas las sesiones (cache_resource): la base normalizada con su
+# cubo pre-agregado e índice de filtros por ámbito, el motor de consultas (UY_BACKEND), los
+# resultados precalculados, las cachés de vistas y de series anuales y el registro de uso.
+# Los datos se leen recién al pedirlos, solo las particiones del ámbito, y los lotes nuevos
+# se incorporan de forma incremental. Se obtienen en el hilo del script y se pasan como
+# argumento, así también los usa el precalentamiento, que corre fuera de Streamlit.
+@st.cache_resource
+def load_resources():
+    store = uydata.ProcurementStore(uydata.DATA_PATH)
+    return {
+        "base": store,
+        "motor": uyquery.open_backend(store),
+        "precalculado": uydata.PrecomputedSource(uydata.PRECOMPUTED_PATH or uydata.precomputed_dir(uydata.DATA_PATH)),
+        "vistas": uydata.ResultCache(),
+        "series": uydata.ResultCache(max_entries=4096, max_bytes=64_000_000),
+        "uso": uydata.UsageLog(uydata.USAGE_PATH or uydata.usage_path(uydata.DATA_PATH)),
+    }
+
+# Motor de consultas actualizado con los lotes nuevos, junto con la versión del dataset
+def load_engine(res):
+    store = res["base"]
+    store.refresh()
+    return store.version, res["motor"]
+
+# Devuelve la vista guardada para la clave (página, versión, filtros) o la calcula y guarda
+def cached_view(res, key, compute):
+    cache = res["vistas"]
+    view = cache.get(key)
+    if view is None:
+        with uyperf.stage("vista"):
+            view = compute()
+        cache.put(key, view, view_size(view))
+    return view
+
+# Tamaño aproximado de una vista: gráficos serializados más el resumen numérico, si lo hay
+def view_size(view):
+    size = sum(len(spec) for spec in view["figuras"].values() if spec)
+    if "resumen" in view:
+        size += int(view["resumen"].memory_usage(deep=True).sum())
+    return size
+
+# Reconstruye un gráfico desde su JSON sin volver a validarlo
+def figure_from_spec(spec):
+    return go.Figure(json.loads(spec), _validate=False)
+
+# Gráfico de dona con el porcentaje de la primera categoría en el centro
+@uyperf.timed("figura_dona")
+def donut_figure(percentage, names, colors):
+    donut_data = pd.DataFrame({
+        "Categoría": names,
+        "Valor": [percentage, 100 - percentage]
+    })
+    donut_fig = px.pie(
+        donut_data,
+        values="Valor",
+        names="Categoría",
+        hole=0.7,
+        color_discrete_map=dict(zip(names, colors))
+    )
+    donut_fig.update_traces(textinfo="none", hoverinfo="label+percent")
+    donut_fig.update_layout(
+        margin=dict(l=10, r=10, t=10, b=10),
+        height=200,
+        width=250,
+        annotations=[dict(text=f"{percentage:.1f}%", x=0.5, y=0.5,
+                          font_size=28, font_color="white", showarrow=False)]
+    )
+    return donut_fig
+
+# Frecuencia de contratos por año: barras con el total y línea con los ganados por empresas
+# uruguayas (solo los años en que hubo alguno)
+@uyperf.timed("figura_frecuencia")
+def frequency_figure(yearly, height):
+    df_local = yearly[yearly["contratos_uy"] > 0]
+    fig_freq = go.Figure()
+    fig_freq.add_trace(go.Bar(
+        x=yearly["contract_year"],
+        y=yearly["contratos"],
+        name="Total Contratos",
+        marker_color="#003049"
+    ))
+    fig_freq.add_trace(go.Scatter(
+        x=df_local["contract_year"],
+        y=df_local["contratos_uy"],
+        name="Contratos Uruguay",
+        mode="lines+markers",
+        line=dict(color="#669bbc"),
+        yaxis="y2"
+    ))
+    fig_freq.update_layout(
+        title=dict(text="Frecuencia de Contratos por Año", x=0.5, pad=dict(b=40)),
+        legend=dict(orientation="h", yanchor="bottom", y=1.0, xanchor="center", x=0.5),
+        xaxis_title="",
+        height=height,
+        margin=dict(l=10, r=10, t=60, b=10),
+        yaxis=dict(title="Total Contratos", side="left", showgrid=False),
+        yaxis2=dict(title="Contratos Uruguay", overlaying="y", side="right", showgrid=False),
+        xaxis=dict(showgrid=False)
+    )
+    return fig_freq
+
+# Gráfico de montos: suma de idb_amount por año con color "gray" y sin gridlines
+@uyperf.timed("figura_montos")
+def amount_figure(yearly, width=None):
+    fig_bar = px.bar(
+        yearly,
+        x="contract_year",
+        y="monto",
+        labels={"contract_year": "Año", "monto": "Monto IDB"}
+    )
+    fig_bar.update_traces(marker_color="gray")
+    fig_bar.update_layout(
+        width=width,
+        height=250,
+        margin=dict(l=10, r=10, t=10, b=10),
+        xaxis=dict(showgrid=False),
+        yaxis=dict(showgrid=False)
+    )
+    return fig_bar
+
+# Tabla pivot ya formateada como go.Table con filas alternadas
+@uyperf.timed("figura_tabla")
+def pivot_table_figure(summary):
+    header_values = list(summary.columns)
+    cell_values = [summary[col].tolist() for col in summary.columns]
+    
+    n_rows = len(summary)
+    row_colors = ['#222222' if i % 2 == 0 else '#333333' for i in range(n_rows)]
+    fill_colors = [row_colors] * len(header_values)
+    
+    fig_table = go.Figure(data=[go.Table(
+        header=dict(
+            values=header_values,
+            fill_color="#444444",
+            font=dict(color="white", size=16),
+            align="center"
+        ),
+        cells=dict(
+            values=cell_values,
+            fill_color=fill_colors,
+            font=dict(color="white", size=14),
+            align="center",
+            height=35
+        )
+    )])
+    fig_table.update_layout(margin=dict(l=10, r=10, t=10, b=10),
+                            paper_bgcolor="#000000",
+                            plot_bgcolor="#000000")
+    return fig_table
+
+# Resultados de `python uydata.py precalcular` utilizables para la página: solo si existen
+# y son de la versión actual del dataset
+def precomputed_results(res, version, page, group_by="contract_year"):
+    results = res["precalculado"].current()
+    if results is not None and results.version == version and results.has(page, group_by):
+        return results
+    return None
+
+# Filtros elegidos más los fijos de la página, en la forma de la API de consultas (el grupo
+# Mercosur pasa a su lista de países)
+def query_filters(base, filters):
+    query = dict(base)
+    for column, value in filters.items():
+        if column == "operation_country_name" and value == "Mercosur":
+            value = uydata.MERCOSUR_COUNTRIES
+        query[column] = value
+    return query
+
+# Serie anual de una página de país para los filtros categóricos, sin el rango de años: se
+# arma una sola vez por estado (de los resultados precalculados si los hay, si no agregando
+# el cubo) y mover el slider solo consulta sus sumas acumuladas
+def year_series(res, page, version, filters, base, exclude=None):
+    state = {k: v for k, v in filters.items() if k != "contract_year"}
+    key = (page, version, tuple(state.items()))
+    cache = res["series"]
+    series = cache.get(key)
+    if series is None:
+        with uyperf.stage("serie_anual"):
+            precomputed = precomputed_results(res, version, page)
+            if precomputed is not None:
+                yearly = precomputed.series(page, state)
+            else:
+                engine = res["motor"]
+                by_year = ["contract_year"] if "contract_year" in engine.columns(page) else []
+                yearly = engine.aggregate(page, by_year, query_filters(base, state), exclude)
+            series = uydata.YearSeries(yearly)
+        cache.put(key, series, series.nbytes)
+    return series
+
+# KPIs y gráficos de una página de país para un rango de años de su serie anual; sin
+# años en el dataset no hay gráficos de frecuencia ni de montos
+def country_view(series, years, donut_names, donut_colors, freq_height, bar_width=None):
+    totals = series.totals(*years)
+    yearly = series.between(*years)
+    total = totals["contratos"]
+    percentage = (totals["contratos_uy"] / total * 100) if total > 0 else 0
+    figures = {
+        "dona": donut_figure(percentage, donut_names, donut_colors).to_json(),
+        "frecuencia": frequency_figure(yearly, height=freq_height).to_json() if series.has_years else None,
+        "montos": amount_figure(yearly, width=bar_width).to_json() if series.has_years else None,
+    }
+    return {"total": total, "porcentaje": percentage, "figuras": figures}
+
+# Selección fija de cada página de país: operaciones en Uruguay o fuera de Uruguay
+BASE_NACIONAL = {"operation_country_name": "Uruguay"}
+EXCLUDE_EXTERIOR = {"operation_country_name": "Uruguay"}
+
+# Vistas de cada página para un estado de filtros (desde la caché si ya se calcularon)
+def nacional_view(res, version, filters, base=BASE_NACIONAL):
+    return cached_view(res, ("nacional", version, tuple(filters.items())),
+                       lambda: country_view(year_series(res, "nacional", version, filters, base),
+                                            filters.get("contract_year", (None, None)),
+                                            ["Locales", "No Locales"], ["#669bbc", "#cccccc"], freq_height=220))
+
+def exterior_view(res, version, filters, exclude=EXCLUDE_EXTERIOR):
+    return cached_view(res, ("exterior", version, tuple(filters.items())),
+                       lambda: country_view(year_series(res, "exterior", version, filters, {}, exclude),
+                                            filters.get("contract_year", (None, None)),
+                                            ["Uruguay", "Otros"], ["#669bbc", "#003049"],
+                                            freq_height=260, bar_width=600))
+
+# El resumen de la tabla pivot queda numérico y se guarda una sola vez por estado de
+# filtros, junto con la fila Total; ordenar y paginar no vuelve a agregar
+def pivot_view(res, version, filters, group_by):
+    def compute():
+        precomputed = precomputed_results(res, version, "pivot", group_by)
+        if precomputed is not None:
+            summary = precomputed.pivot(group_by, filters)
+        else:
+            summary = res["motor"].aggregate(None, [group_by], filters)
+        return {"resumen": summary, "totales": uydata.pivot_totals(summary), "figuras": {}}
+    return cached_view(res, ("pivot", version, group_by, tuple(filters.items())), compute)
+
+# Envía un gráfico al navegador (serialización incluida)
+def show_chart(fig, **kwargs):
+    with uyperf.stage("envio"):
+        st.plotly_chart(fig, **kwargs)
 
 # Página Principal
 def pagina_principal():
@@ -32,62 +264,46 @@ Esta aplicación permite explorar los contratos de acuerdo a su ámbito:
 # Página Uruguay Nacional
 def pagina_uruguay_nacional():
     st.title("Uruguay Nacional")
+    res = load_resources()
+    version, engine = load_engine(res)
+    columns = engine.columns("nacional")
+    filters = {}
     
     # Filtrar contratos con operación en Uruguay
-    data_nacional = data.copy()
-    if "operation_country_name" in data_nacional.columns:
-        data_nacional = data_nacional[data_nacional["operation_country_name"] == "Uruguay"]
+    base = BASE_NACIONAL if "operation_country_name" in columns else {}
     
     # Filtro de tiempo por año de contrato
-    if "contract_year" in data_nacional.columns:
-        min_year = int(data_nacional["contract_year"].min())
-        max_year = int(data_nacional["contract_year"].max())
+    if "contract_year" in columns:
+        min_year, max_year = engine.year_bounds("nacional", base)
         year_range = st.sidebar.slider("Año de Contrato", min_value=min_year, max_value=max_year,
                                        value=(min_year, max_year), step=1)
-        data_nacional = data_nacional[(data_nacional["contract_year"] >= year_range[0]) & 
-                                      (data_nacional["contract_year"] <= year_range[1])]
+        filters["contract_year"] = tuple(year_range)
     
     # Filtros adicionales: Tipo de Contrato, Tipo de Operación y Sector Económico
-    if "contract_type" in data_nacional.columns:
-        contract_types = sorted(data_nacional["contract_type"].dropna().unique())
+    if "contract_type" in columns:
+        contract_types = engine.values("nacional", "contract_type", query_filters(base, filters))
         selected_contract_type = st.sidebar.selectbox("Tipo de Contrato", ["Todos"] + contract_types)
         if selected_contract_type != "Todos":
-            data_nacional = data_nacional[data_nacional["contract_type"] == selected_contract_type]
-    if "operation_type_name" in data_nacional.columns:
-        op_types = sorted(data_nacional["operation_type_name"].dropna().unique())
+            filters["contract_type"] = selected_contract_type
+    if "operation_type_name" in columns:
+        op_types = engine.values("nacional", "operation_type_name", query_filters(base, filters))
         selected_op_type = st.sidebar.selectbox("Tipo de Operación", ["Todos"] + op_types)
         if selected_op_type != "Todos":
-            data_nacional = data_nacional[data_nacional["operation_type_name"] == selected_op_type]
-    if "economic_sector_name" in data_nacional.columns:
-        sectors = sorted(data_nacional["economic_sector_name"].dropna().unique())
+            filters["operation_type_name"] = selected_op_type
+    if "economic_sector_name" in columns:
+        sectors = engine.values("nacional", "economic_sector_name", query_filters(base, filters))
         selected_sector = st.sidebar.selectbox("Sector Económico", ["Todos"] + sectors)
         if selected_sector != "Todos":
-            data_nacional = data_nacional[data_nacional["economic_sector_name"] == selected_sector]
+            filters["economic_sector_name"] = selected_sector
     
     st.write("Mostrando contratos en Uruguay (Operación Nacional).")
     
-    total_nacional = data_nacional.shape[0]
-    local_awarded = data_nacional[data_nacional["awarded_firm_country_name"] == "Uruguay"].shape[0]
-    percentage_local = (local_awarded / total_nacional * 100) if total_nacional > 0 else 0
-    
-    # Gráfico de montos: Suma de idb_amount por año con color "gray" y sin gridlines
-    if "contract_year" in data_nacional.columns and "idb_amount" in data_nacional.columns:
-        df_bar = data_nacional.groupby("contract_year")["idb_amount"].sum().reset_index()
-        fig_bar = px.bar(
-            df_bar,
-            x="contract_year",
-            y="idb_amount",
-            labels={"contract_year": "Año", "idb_amount": "Monto IDB"}
-        )
-        fig_bar.update_traces(marker_color="gray")
-        fig_bar.update_layout(
-            height=250,
-            margin=dict(l=10, r=10, t=10, b=10),
-            xaxis=dict(showgrid=False),
-            yaxis=dict(showgrid=False)
-        )
-    else:
-        fig_bar = None
+    # Las vistas repetidas (o ya precalentadas) salen de la caché sin agregar ni construir
+    # gráficos; el estado queda en el registro de uso para el próximo precalentamiento
+    res["uso"].record("nacional", filters)
+    view = nacional_view(res, version, filters, base)
+    total_nacional = view["total"]
+    figures = view["figuras"]
 
     col_left, col_right = st.columns([0.3, 0.7])
     with col_left:
@@ -103,135 +319,70 @@ def pagina_uruguay_nacional():
     <h3 style="color: white; margin-bottom: 10px; font-size: 16px; font-weight: bold;">% Locales Ganados</h3>
 </div>
 """, unsafe_allow_html=True)
-        donut_data = pd.DataFrame({
-            "Categoría": ["Locales", "No Locales"],
-            "Valor": [percentage_local, 100 - percentage_local]
-        })
-        donut_fig = px.pie(
-            donut_data,
-            values="Valor",
-            names="Categoría",
-            hole=0.7,
-            color_discrete_map={"Locales": "#669bbc", "No Locales": "#cccccc"}
-        )
-        donut_fig.update_traces(textinfo="none", hoverinfo="label+percent")
-        donut_fig.update_layout(
-            margin=dict(l=10, r=10, t=10, b=10),
-            height=200,
-            width=250,
-            annotations=[dict(text=f"{percentage_local:.1f}%", x=0.5, y=0.5,
-                              font_size=28, font_color="white", showarrow=False)]
-        )
-        st.plotly_chart(donut_fig, use_container_width=False)
+        show_chart(figure_from_spec(figures["dona"]), use_container_width=False)
     
     with col_right:
-        if "contract_year" in data_nacional.columns:
-            df_total = data_nacional.groupby("contract_year").size().reset_index(name="Total Contratos")
-            df_local = data_nacional[data_nacional["awarded_firm_country_name"] == "Uruguay"]\
-                        .groupby("contract_year").size().reset_index(name="Contratos Uruguay")
-            fig_freq = go.Figure()
-            fig_freq.add_trace(go.Bar(
-                x=df_total["contract_year"],
-                y=df_total["Total Contratos"],
-                name="Total Contratos",
-                marker_color="#003049"
-            ))
-            fig_freq.add_trace(go.Scatter(
-                x=df_local["contract_year"],
-                y=df_local["Contratos Uruguay"],
-                name="Contratos Uruguay",
-                mode="lines+markers",
-                line=dict(color="#669bbc"),
-                yaxis="y2"
-            ))
-            fig_freq.update_layout(
-                title=dict(text="Frecuencia de Contratos por Año", x=0.5, pad=dict(b=40)),
-                legend=dict(orientation="h", yanchor="bottom", y=1.0, xanchor="center", x=0.5),
-                xaxis_title="",
-                height=220,
-                margin=dict(l=10, r=10, t=60, b=10),
-                yaxis=dict(title="Total Contratos", side="left", showgrid=False),
-                yaxis2=dict(title="Contratos Uruguay", overlaying="y", side="right", showgrid=False),
-                xaxis=dict(showgrid=False)
-            )
-            st.plotly_chart(fig_freq, use_container_width=True)
+        if figures["frecuencia"]:
+            show_chart(figure_from_spec(figures["frecuencia"]), use_container_width=True)
         else:
             st.write("No se encontró información para el gráfico de frecuencia.")
         
-        if fig_bar:
-            st.plotly_chart(fig_bar, use_container_width=True)
+        if figures["montos"]:
+            show_chart(figure_from_spec(figures["montos"]), use_container_width=True)
         else:
             st.write("No se encontró la información necesaria para el gráfico de montos.")
 
 # Página Uruguay en el Mundo
 def pagina_uruguay_en_el_mundo():
     st.title("Uruguay en el Mundo")
+    res = load_resources()
+    version, engine = load_engine(res)
+    columns = engine.columns("exterior")
+    filters = {}
     
-    data_mundial = data.copy()
-    if "operation_country_name" in data_mundial.columns:
-        data_mundial = data_mundial[data_mundial["operation_country_name"] != "Uruguay"]
+    # Contratos con operación fuera de Uruguay
+    base = {}
+    exclude = EXCLUDE_EXTERIOR if "operation_country_name" in columns else None
     
-    if "contract_year" in data_mundial.columns:
-        min_year = int(data_mundial["contract_year"].min())
-        max_year = int(data_mundial["contract_year"].max())
+    if "contract_year" in columns:
+        min_year, max_year = engine.year_bounds("exterior", base, exclude)
         year_range = st.sidebar.slider("Año de Contrato", min_value=min_year, max_value=max_year,
                                        value=(min_year, max_year), step=1)
-        data_mundial = data_mundial[(data_mundial["contract_year"] >= year_range[0]) & 
-                                    (data_mundial["contract_year"] <= year_range[1])]
+        filters["contract_year"] = tuple(year_range)
     
-    if "contract_type" in data_mundial.columns:
-        contract_types = sorted(data_mundial["contract_type"].dropna().unique())
+    if "contract_type" in columns:
+        contract_types = engine.values("exterior", "contract_type", query_filters(base, filters), exclude)
         selected_contract_type = st.sidebar.selectbox("Tipo de Contrato", ["Todos"] + contract_types)
         if selected_contract_type != "Todos":
-            data_mundial = data_mundial[data_mundial["contract_type"] == selected_contract_type]
-    if "operation_type_name" in data_mundial.columns:
-        op_types = sorted(data_mundial["operation_type_name"].dropna().unique())
+            filters["contract_type"] = selected_contract_type
+    if "operation_type_name" in columns:
+        op_types = engine.values("exterior", "operation_type_name", query_filters(base, filters), exclude)
         selected_op_type = st.sidebar.selectbox("Tipo de Operación", ["Todos"] + op_types)
         if selected_op_type != "Todos":
-            data_mundial = data_mundial[data_mundial["operation_type_name"] == selected_op_type]
-    if "economic_sector_name" in data_mundial.columns:
-        sectors = sorted(data_mundial["economic_sector_name"].dropna().unique())
+            filters["operation_type_name"] = selected_op_type
+    if "economic_sector_name" in columns:
+        sectors = engine.values("exterior", "economic_sector_name", query_filters(base, filters), exclude)
         selected_sector = st.sidebar.selectbox("Sector Económico", ["Todos"] + sectors)
         if selected_sector != "Todos":
-            data_mundial = data_mundial[data_mundial["economic_sector_name"] == selected_sector]
+            filters["economic_sector_name"] = selected_sector
     
-    if "operation_country_name" in data_mundial.columns:
-        unique_countries = sorted(data_mundial["operation_country_name"].dropna().unique())
+    if "operation_country_name" in columns:
+        unique_countries = engine.values("exterior", "operation_country_name", query_filters(base, filters), exclude)
         op_country_options = ["Todos", "Mercosur"] + unique_countries
         selected_op_country = st.sidebar.selectbox("País de Operación", op_country_options)
         if selected_op_country != "Todos":
-            if selected_op_country == "Mercosur":
-                mercosur_countries = ["Argentina", "Bolivia", "Brazil", "Paraguay"]
-                data_mundial = data_mundial[data_mundial["operation_country_name"].isin(mercosur_countries)]
-            else:
-                data_mundial = data_mundial[data_mundial["operation_country_name"] == selected_op_country]
+            filters["operation_country_name"] = selected_op_country
     
     eliminar_iguales = st.sidebar.checkbox("Eliminar observaciones donde 'Operación' y 'Adjudicatario' sean iguales", value=False)
     if eliminar_iguales:
-        data_mundial = data_mundial[data_mundial["operation_country_name"] != data_mundial["awarded_firm_country_name"]]
+        filters["mismo_pais"] = False
     
     st.write("Mostrando contratos en otros países, donde se evalúa la participación de empresas uruguayas.")
     
-    total_mundial = data_mundial.shape[0]
-    total_mundial_str = f"{total_mundial:,}"
-    
-    uruguayan_contracts = data_mundial[data_mundial["awarded_firm_country_name"] == "Uruguay"].shape[0]
-    percentage_uruguayan = (uruguayan_contracts / total_mundial * 100) if total_mundial > 0 else 0
-    
-    if "contract_year" in data_mundial.columns and "idb_amount" in data_mundial.columns:
-        df_bar = data_mundial.groupby("contract_year")["idb_amount"].sum().reset_index()
-        fig_bar = px.bar(
-            df_bar,
-            x="contract_year",
-            y="idb_amount",
-            labels={"contract_year": "Año", "idb_amount": "Monto IDB"}
-        )
-        fig_bar.update_traces(marker_color="gray")
-        fig_bar.update_layout(width=600, height=250, margin=dict(l=10, r=10, t=10, b=10),
-                              xaxis=dict(showgrid=False),
-                              yaxis=dict(showgrid=False))
-    else:
-        fig_bar = None
+    res["uso"].record("exterior", filters)
+    view = exterior_view(res, version, filters, exclude)
+    total_mundial_str = f"{view['total']:,}"
+    figures = view["figuras"]
 
     col_left, col_right = st.columns([0.3, 0.7])
     with col_left:
@@ -247,167 +398,200 @@ def pagina_uruguay_en_el_mundo():
     <h3 style="color: white; margin-bottom: 10px; font-size: 16px; font-weight: bold;">% Empresa Uruguaya</h3>
 </div>
 """, unsafe_allow_html=True)
-        donut_data = pd.DataFrame({
-            "Categoría": ["Uruguay", "Otros"],
-            "Valor": [percentage_uruguayan, 100 - percentage_uruguayan]
-        })
-        # Se asignan los colores solicitados: #669bbc para Uruguay y #003049 para Otros
-        donut_fig = px.pie(
-            donut_data,
-            values="Valor",
-            names="Categoría",
-            hole=0.7,
-            color_discrete_map={"Uruguay": "#669bbc", "Otros": "#003049"}
-        )
-        donut_fig.update_traces(textinfo="none", hoverinfo="label+percent")
-        donut_fig.update_layout(margin=dict(l=10, r=10, t=10, b=10),
-                                height=200,
-                                width=250,
-                                annotations=[dict(text=f"{percentage_uruguayan:.1f}%", x=0.5, y=0.5,
-                                                  font_size=28, font_color="white", showarrow=False)])
-        st.plotly_chart(donut_fig, use_container_width=False)
+        # Colores de la dona: #669bbc para Uruguay y #003049 para Otros; la frecuencia va
+        # con altura incrementada (260)
+        show_chart(figure_from_spec(figures["dona"]), use_container_width=False)
     
     with col_right:
-        if "contract_year" in data_mundial.columns:
-            df_total = data_mundial.groupby("contract_year").size().reset_index(name="Total Contratos")
-            df_uruguayan = data_mundial[data_mundial["awarded_firm_country_name"] == "Uruguay"]\
-                           .groupby("contract_year").size().reset_index(name="Contratos Uruguay")
-            fig_freq = go.Figure()
-            fig_freq.add_trace(go.Bar(
-                x=df_total["contract_year"],
-                y=df_total["Total Contratos"],
-                name="Total Contratos",
-                marker_color="#003049"
-            ))
-            fig_freq.add_trace(go.Scatter(
-                x=df_uruguayan["contract_year"],
-                y=df_uruguayan["Contratos Uruguay"],
-                name="Contratos Uruguay",
-                mode="lines+markers",
-                line=dict(color="#669bbc"),
-                yaxis="y2"
-            ))
-            fig_freq.update_layout(
-                title=dict(text="Frecuencia de Contratos por Año", x=0.5, pad=dict(b=40)),
-                legend=dict(orientation="h", yanchor="bottom", y=1.0, xanchor="center", x=0.5),
-                xaxis_title="",
-                height=260,  # Altura incrementada
-                margin=dict(l=10, r=10, t=60, b=10),
-                yaxis=dict(title="Total Contratos", side="left", showgrid=False),
-                yaxis2=dict(title="Contratos Uruguay", overlaying="y", side="right", showgrid=False),
-                xaxis=dict(showgrid=False)
-            )
-            st.plotly_chart(fig_freq, use_container_width=True)
+        if figures["frecuencia"]:
+            show_chart(figure_from_spec(figures["frecuencia"]), use_container_width=True)
         else:
             st.write("No se encontró información para el gráfico de frecuencia.")
         
-        if fig_bar:
-            st.plotly_chart(fig_bar, use_container_width=True)
+        if figures["montos"]:
+            show_chart(figure_from_spec(figures["montos"]), use_container_width=True)
         else:
             st.write("No se encontró la información necesaria para el gráfico de montos.")
 
+# Columnas visibles de la tabla pivot, en orden
+PIVOT_COLUMNS = {
+    "contratos": "Total Contratos",
+    "contratos_uy": "Contratos Ganados por Empresas Uruguayas",
+    "pct_contratos_uy": "% Contratos a Empresas UY",
+    "monto": "Monto Total Adjudicado (USD)",
+    "monto_uy": "Monto a Uruguay (USD)",
+    "pct_monto_uy": "% Monto a Uruguay",
+}
+
+# Tamaños de página de la tabla pivot
+PIVOT_PAGE_SIZES = [25, 50, 100, 250]
+
+# Da formato de visualización al resumen numérico y agrega la fila "Total"
+@uyperf.timed("formato")
+def pivot_display(summary, totals, group_by):
+    total_row = pd.DataFrame({group_by: ["Total"], **{k: [v] for k, v in totals.items()}})
+    table = pd.concat([summary.astype({group_by: object}), total_row], ignore_index=True)
+    for col in ("monto", "monto_uy"):
+        table[col] = table[col].map("${:,.0f}".format)
+    for col in ("pct_contratos_uy", "pct_monto_uy"):
+        table[col] = table[col].astype(float).round(2).astype(str) + "%"
+    table = table.rename(columns={group_by: uydata.PIVOT_DIMENSIONS[group_by], **PIVOT_COLUMNS})
+    return table[[uydata.PIVOT_DIMENSIONS[group_by]] + list(PIVOT_COLUMNS.values())]
+
 # Página Tabla Pivot (Resumen por País de la Operación)
 def tabla_pivot():
     st.title("Tabla Pivot")
-    df = data.copy()
-    if "contract_type" in df.columns:
-        contract_types = sorted(df["contract_type"].dropna().unique())
+    res = load_resources()
+    version, engine = load_engine(res)
+    columns = engine.columns()
+    filters = {}
+    if "contract_type" in columns:
+        contract_types = engine.values(None, "contract_type", filters)
         selected_contract_type = st.sidebar.selectbox("Tipo de Contrato", ["Todos"] + contract_types)
         if selected_contract_type != "Todos":
-            df = df[df["contract_type"] == selected_contract_type]
-    if "status" in df.columns:
-        statuses = sorted(df["status"].dropna().unique())
+            filters["contract_type"] = selected_contract_type
+    if "status" in columns:
+        statuses = engine.values(None, "status", filters)
         selected_status = st.sidebar.selectbox("Estado", ["Todos"] + statuses)
         if selected_status != "Todos":
-            df = df[df["status"] == selected_status]
-    if "operation_type_name" in df.columns:
-        op_types = sorted(df["operation_type_name"].dropna().unique())
+            filters["status"] = selected_status
+    if "operation_type_name" in columns:
+        op_types = engine.values(None, "operation_type_name", filters)
         selected_op_type = st.sidebar.selectbox("Tipo de Operación", ["Todos"] + op_types)
         if selected_op_type != "Todos":
-            df = df[df["operation_type_name"] == selected_op_type]
-    if "economic_sector_name" in df.columns:
-        sectors = sorted(df["economic_sector_name"].dropna().unique())
+            filters["operation_type_name"] = selected_op_type
+    if "economic_sector_name" in columns:
+        sectors = engine.values(None, "economic_sector_name", filters)
         selected_sector = st.sidebar.selectbox("Sector Económico", ["Todos"] + sectors)
         if selected_sector != "Todos":
-            df = df[df["economic_sector_name"] == selected_sector]
-    
-    summary = df.groupby("operation_country_name").apply(lambda g: pd.Series({
-         "Total Contratos": g.shape[0],
-         "Contratos Ganados por Empresas Uruguayas": (g["awarded_firm_country_name"] == "Uruguay").sum(),
-         "Monto Total Adjudicado (USD)": g["idb_amount"].sum(),
-         "Monto a Uruguay (USD)": g.loc[g["awarded_firm_country_name"] == "Uruguay", "idb_amount"].sum()
-    })).reset_index()
-    
-    summary["% Contratos a Empresas UY"] = (summary["Contratos Ganados por Empresas Uruguayas"] / summary["Total Contratos"] * 100).round(2)
-    summary["% Monto a Uruguay"] = (summary["Monto a Uruguay (USD)"] / summary["Monto Total Adjudicado (USD)"] * 100).round(2)
-    
-    total_contratos = summary["Total Contratos"].sum()
-    total_contratos_uy = summary["Contratos Ganados por Empresas Uruguayas"].sum()
-    total_monto_total = summary["Monto Total Adjudicado (USD)"].sum()
-    total_monto_uy = summary["Monto a Uruguay (USD)"].sum()
-    pct_contratos = round((total_contratos_uy / total_contratos * 100),2) if total_contratos > 0 else 0
-    pct_monto = round((total_monto_uy / total_monto_total * 100),2) if total_monto_total > 0 else 0
+            filters["economic_sector_name"] = selected_sector
     
-    summary["Monto Total Adjudicado (USD)"] = summary["Monto Total Adjudicado (USD)"].apply(lambda x: f"${x:,.0f}")
-    summary["Monto a Uruguay (USD)"] = summary["Monto a Uruguay (USD)"].apply(lambda x: f"${x:,.0f}")
-    summary["% Contratos a Empresas UY"] = summary["% Contratos a Empresas UY"].astype(str) + "%"
-    summary["% Monto a Uruguay"] = summary["% Monto a Uruguay"].astype(str) + "%"
+    # Dimensión de agrupación de la tabla
+    dimensions = [d for d in uydata.PIVOT_DIMENSIONS if d in columns]
+    group_by = st.sidebar.selectbox("Agrupar por", dimensions, format_func=uydata.PIVOT_DIMENSIONS.get)
     
-    summary = summary.rename(columns={"operation_country_name": "País de la Operación"})
-    summary = summary[["País de la Operación", "Total Contratos", "Contratos Ganados por Empresas Uruguayas",
-                       "% Contratos a Empresas UY", "Monto Total Adjudicado (USD)", "Monto a Uruguay (USD)", "% Monto a Uruguay"]]
-    
-    total_row = pd.DataFrame({
-         "País de la Operación": ["Total"],
-         "Total Contratos": [total_contratos],
-         "Contratos Ganados por Empresas Uruguayas": [total_contratos_uy],
-         "% Contratos a Empresas UY": [f"{pct_contratos}%"],
-         "Monto Total Adjudicado (USD)": [f"${total_monto_total:,.0f}"],
-         "Monto a Uruguay (USD)": [f"${total_monto_uy:,.0f}"],
-         "% Monto a Uruguay": [f"{pct_monto}%"]
-    })
-    summary = pd.concat([summary, total_row], ignore_index=True)
-    
-    header_values = list(summary.columns)
-    cell_values = [summary[col].tolist() for col in summary.columns]
-    
-    n_rows = len(summary)
-    row_colors = ['#222222' if i % 2 == 0 else '#333333' for i in range(n_rows)]
-    fill_colors = [row_colors] * len(header_values)
-    
-    fig_table = go.Figure(data=[go.Table(
-        header=dict(
-            values=header_values,
-            fill_color="#444444",
-            font=dict(color="white", size=16),
-            align="center"
-        ),
-        cells=dict(
-            values=cell_values,
-            fill_color=fill_colors,
-            font=dict(color="white", size=14),
-            align="center",
-            height=35
-        )
-    )])
-    fig_table.update_layout(margin=dict(l=10, r=10, t=10, b=10),
-                            paper_bgcolor="#000000",
-                            plot_bgcolor="#000000")
-    st.plotly_chart(fig_table, use_container_width=True)
+    res["uso"].record("pivot", {"agrupar_por": group_by, **filters})
+    view = pivot_view(res, version, filters, group_by)
+    tabla_paginada(view["resumen"], view["totales"], group_by)
+
+# Tabla pivot ordenada y paginada en el servidor; al navegador solo va la página visible.
+# Es un fragmento: cambiar orden, tamaño o página vuelve a ejecutar solo la tabla, sin
+# reevaluar los filtros ni buscar el resumen.
+@st.fragment
+def tabla_paginada(summary, totals, group_by):
+    with uyperf.run("Tabla Pivot"):
+        sort_labels = {group_by: uydata.PIVOT_DIMENSIONS[group_by], **PIVOT_COLUMNS}
+        col_sort, col_order, col_size, col_page = st.columns([0.4, 0.2, 0.2, 0.2])
+        sort_by = col_sort.selectbox("Ordenar por", list(sort_labels), format_func=sort_labels.get)
+        descending = col_order.selectbox("Orden", ["Ascendente", "Descendente"]) == "Descendente"
+        page_size = col_size.selectbox("Filas por página", PIVOT_PAGE_SIZES, index=1)
+        n_pages = max(1, math.ceil(len(summary) / page_size))
+        page = col_page.number_input(f"Página (de {n_pages})", min_value=1, max_value=n_pages, value=1, step=1)
+        
+        rows = uydata.pivot_page(summary, sort_by, descending, page - 1, page_size)
+        table = pivot_display(rows, totals, group_by)
+        show_chart(pivot_table_figure(table), use_container_width=True)
+        if len(rows):
+            first = (page - 1) * page_size + 1
+            st.caption(f"{len(summary):,} grupos · filas {first:,}–{first + len(rows) - 1:,}")
+
+# Panel de diagnóstico (solo con UY_PERF): etapas del último rerun de la página
+def panel_rendimiento(pagina):
+    runs = uyperf.history(pagina)
+    with st.sidebar.expander("Diagnóstico de rendimiento"):
+        if not runs:
+            st.write("Sin mediciones todavía.")
+            return
+        stages = pd.DataFrame(runs[-1]["stages"])
+        stages["ms"] = (stages["seconds"] * 1000).round(1)
+        stages["MB pico"] = (stages["peak_bytes"] / 1e6).round(2)
+        st.dataframe(stages[["stage", "ms", "rows_in", "rows_out", "MB pico"]], hide_index=True)
+        recent = [r["stages"][-1]["seconds"] * 1000 for r in runs[-20:]]
+        st.write(f"Reruns medidos: {len(runs)} · mediana últimos {len(recent)}: {sorted(recent)[len(recent) // 2]:.0f} ms")
+        res = load_resources()
+        for name, cache in (("vistas", res["vistas"]), ("series anuales", res["series"])):
+            stats = cache.stats()
+            st.write(f"Caché de {name}: {stats['entries']} entradas · {stats['bytes'] / 1e6:.1f} MB · "
+                     f"aciertos {stats['hits']} / fallos {stats['misses']} ({stats['hit_rate']:.0%}) · "
+                     f"desalojos {stats['evictions']}")
+        tasks = start_warmup().status()
+        if tasks:
+            st.write("Precalentamiento:")
+            st.dataframe(pd.DataFrame(tasks), hide_index=True)
+
+# Precalentamiento: hilos en segundo plano (UY_WARMUP_WORKERS; 0 lo desactiva) y cuántos
+# de los estados más pedidos del registro de uso se calculan además de los por defecto
+WARMUP_WORKERS = int(os.environ.get("UY_WARMUP_WORKERS", "2"))
+WARMUP_FREQUENT = int(os.environ.get("UY_WARMUP_FREQUENT", "20"))
+
+# Carga la base y deja armados el cubo y el índice (o la tabla Arrow) de cada ámbito
+def warm_data(res):
+    for ambito in (*uydata.AMBITOS, None):
+        res["motor"].columns(ambito)
+
+# Calcula y guarda la vista de una página para un estado de filtros; sin estado, la vista
+# por defecto (todo el rango de años y los filtros en "Todos")
+def warm_view(res, page, state=None):
+    engine, version = res["motor"], res["base"].version
+    if page == "nacional":
+        if state is None:
+            state = {}
+            if "contract_year" in engine.columns("nacional"):
+                state["contract_year"] = engine.year_bounds("nacional", BASE_NACIONAL)
+        nacional_view(res, version, state)
+    elif page == "exterior":
+        if state is None:
+            state = {}
+            if "contract_year" in engine.columns("exterior"):
+                state["contract_year"] = engine.year_bounds("exterior", {}, EXCLUDE_EXTERIOR)
+        exterior_view(res, version, state)
+    elif page == "pivot":
+        state = dict(state or {"agrupar_por": next(iter(uydata.PIVOT_DIMENSIONS))})
+        pivot_view(res, version, state, state.pop("agrupar_por"))
+
+# Arranca el precalentamiento una sola vez por proceso, con la primera sesión (Streamlit no
+# tiene un evento de inicio del servidor). Las páginas no lo esperan: si piden una vista
+# que todavía no está, la calculan ellas y la tarea la encuentra luego en la caché.
+@st.cache_resource
+def start_warmup():
+    tasks = uydata.BackgroundTasks(workers=max(WARMUP_WORKERS, 1), name="precalentamiento")
+    if WARMUP_WORKERS <= 0:
+        return tasks
+    res = load_resources()
+    tasks.submit("carga de datos", warm_data, res)
+    for page in ("nacional", "exterior", "pivot"):
+        tasks.submit(f"{page}: por defecto", warm_view, res, page)
+    for page, state, count in res["uso"].frequent(WARMUP_FREQUENT):
+        tasks.submit(f"{page}: {count} pedidos", warm_view, res, page, state)
+    return tasks
+
+# La página corre como fragmento: un cambio en sus filtros (también los de la barra
+# lateral) vuelve a ejecutar solo la página, no la navegación. Los gráficos cuyo estado
+# de filtros ya se vio salen de la caché de vistas sin recalcularse. El progreso del
+# precalentamiento se dibuja aquí para que se actualice con cada rerun de la página.
+@st.fragment
+def fragmento_pagina(pagina):
+    done, total = start_warmup().progress()
+    if done < total:
+        st.sidebar.caption(f"Precalentando vistas: {done}/{total}")
+    with uyperf.run(pagina):
+        if pagina == "Página Principal":
+            pagina_principal()
+        elif pagina == "Uruguay Nacional":
+            pagina_uruguay_nacional()
+        elif pagina == "Uruguay en el Mundo":
+            pagina_uruguay_en_el_mundo()
+        elif pagina == "Tabla Pivot":
+            tabla_pivot()
+    if uyperf.enabled():
+        panel_rendimiento(pagina)
 
 # Función principal de navegación
 def main():
     st.sidebar.title("Navegación")
     pagina = st.sidebar.selectbox("Selecciona una página:", 
                                   ("Página Principal", "Uruguay Nacional", "Uruguay en el Mundo", "Tabla Pivot"))
-    if pagina == "Página Principal":
-        pagina_principal()
-    elif pagina == "Uruguay Nacional":
-        pagina_uruguay_nacional()
-    elif pagina == "Uruguay en el Mundo":
-        pagina_uruguay_en_el_mundo()
-    elif pagina == "Tabla Pivot":
-        tabla_pivot()
+    fragmento_pagina(pagina)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,348 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import uydata
+import uyquery
+
+BASELINE_PATH = "uybench_baseline.json"
+
+SIZES = {"100k": 100_000, "1M": 1_000_000, "10M": 10_000_000, "50M": 50_000_000}
+
+# Países con variantes de mayúsculas y espacios, como llegan en el extracto original
+COUNTRIES = {
+    "Uruguay": 0.30, "Argentina": 0.12, "Brazil": 0.12, "Paraguay": 0.06, "Bolivia": 0.06,
+    "Chile": 0.05, "Peru": 0.05, "Colombia": 0.06, "Ecuador": 0.04, "Mexico": 0.05,
+    "Guatemala": 0.03, "Honduras": 0.02, "Panama": 0.02, "Costa Rica": 0.02,
+}
+CONTRACT_TYPES = ["Goods", "Works", "Consulting Services", "Non-Consulting Services"]
+OPERATION_TYPES = ["Investment Loan", "Policy-Based Loan", "Technical Cooperation", "Guarantee"]
+SECTORS = ["Energy", "Transport", "Water and Sanitation", "Health", "Education", "Agriculture",
+           "Public Management", "Social Investment", "Urban Development", "Financial Markets"]
+STATUSES = ["Active", "Closed", "Cancelled"]
+
+
+def _variants(names):
+    out = []
+    for name in names:
+        out += [name, name.upper(), f" {name.lower()} ", f"{name}  "]
+    return np.array(out)
+
+
+def _choice(rng, values, size, p=None):
+    return pa.DictionaryArray.from_arrays(
+        pa.array(rng.choice(len(values), size=size, p=p).astype(np.int32)), pa.array(values)).cast(pa.string())
+
+
+# Lote sintético con el esquema que espera read_procurements (más columnas que no se usan)
+def generate_batch(rows, rng, start=0):
+    names = list(COUNTRIES)
+    weights = np.repeat(np.array(list(COUNTRIES.values())) / sum(COUNTRIES.values()) / 4, 4)
+    countries = _variants(names)
+    operation = rng.choice(len(countries), size=rows, p=weights)
+    # La empresa adjudicataria suele ser del país de la operación
+    local = rng.random(rows) < 0.6
+    awarded = np.where(local, operation, rng.choice(len(countries), size=rows, p=weights))
+    operation_country = pa.DictionaryArray.from_arrays(pa.array(operation.astype(np.int32)), pa.array(countries))
+    awarded_country = pa.DictionaryArray.from_arrays(pa.array(awarded.astype(np.int32)), pa.array(countries))
+    firms = np.array([f"Empresa {i:05d}" for i in range(20_000)])
+    years = rng.integers(1990, 2025, size=rows).astype(np.int64)
+    amount = rng.lognormal(mean=11, sigma=1.6, size=rows)
+    amount[rng.random(rows) < 0.01] = np.nan
+    return pa.table({
+        "contract_id": pa.array(np.arange(start, start + rows, dtype=np.int64)),
+        "operation_country_name": operation_country.cast(pa.string()),
+        "awarded_firm_country_name": awarded_country.cast(pa.string()),
+        "awarded_firm_name": _choice(rng, firms, rows),
+        "contract_type": _choice(rng, CONTRACT_TYPES, rows),
+        "operation_type_name": _choice(rng, OPERATION_TYPES, rows),
+        "economic_sector_name": _choice(rng, SECTORS, rows),
+        "status": _choice(rng, STATUSES, rows, p=[0.45, 0.5, 0.05]),
+        "contract_year": pa.array(years),
+        "idb_amount": pa.array(amount, from_pandas=True),
+    })
+
+
+# Escribe un parquet sintético de `rows` filas por lotes, para no generar todo en memoria
+def generate(path, rows, seed=0, batch_size=1_000_000):
+    rng = np.random.default_rng(seed)
+    writer = None
+    try:
+        for start in range(0, rows, batch_size):
+            batch = generate_batch(min(batch_size, rows - start), rng, start)
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema)
+            writer.write_table(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _timed(fn, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+# Estados de filtros representativos de las páginas: (ámbito, filtros, años)
+def scenarios(index):
+    years = index.year_bounds(index.all())
+    narrow = (max(years[0], years[1] - 4), years[1])
+    return [
+        ("nacional", {}, None),
+        ("nacional", {"contract_type": "Works"}, narrow),
+        ("exterior", {}, None),
+        ("exterior", {"operation_country_name": uydata.MERCOSUR_COUNTRIES, "mismo_pais": False}, narrow),
+        (None, {"status": "Closed"}, None),
+        (None, {"economic_sector_name": "Energy", "operation_type_name": "Investment Loan"}, None),
+    ]
+
+
+# Mide cada etapa del camino de una página sobre el dataset indicado
+def run(path, repeat=3):
+    import uyapp
+
+    results = {}
+    results["carga"], frames = _timed(lambda: uydata.read_ambitos(path), 1)
+
+    def build():
+        cubes = {a: uydata.build_cube(f) for a, f in frames.items()}
+        cubes[None] = uydata.concat_frames(cubes[a] for a in uydata.AMBITOS)
+        return {a: uydata.FilterIndex(c) for a, c in cubes.items()}
+    results["cubo_e_indice"], indexes = _timed(build, 1)
+
+    states = scenarios(indexes[None])
+    results["filtros"], selections = _timed(
+        lambda: [indexes[a].take(indexes[a].select(f, y)) for a, f, y in states], repeat)
+
+    country_pages = [s for (a, _, _), s in zip(states, selections) if a is not None]
+    results["series_anuales"], yearly = _timed(
+        lambda: [uydata.pivot_summary(s, "contract_year") for s in country_pages], repeat)
+
+    # Todos los rangos de años posibles del slider sobre cada serie (sumas acumuladas)
+    def year_ranges():
+        totals = []
+        for series in yearly:
+            index = uydata.YearSeries(series)
+            totals += [index.totals(lo, hi) for lo in index.years for hi in index.years if lo <= hi]
+        return totals
+    results["rangos_anuales"], _ = _timed(year_ranges, repeat)
+
+    pivots = [s for (a, _, _), s in zip(states, selections) if a is None]
+
+    def pivot():
+        tables = []
+        for selection in pivots:
+            for dimension in uydata.PIVOT_DIMENSIONS:
+                summary = uydata.pivot_summary(selection, dimension)
+                rows = uydata.pivot_page(summary, "contratos", descending=True)
+                tables.append(uyapp.pivot_display(rows, uydata.pivot_totals(summary), dimension))
+        return tables
+    results["pivot"], tables = _timed(pivot, repeat)
+
+    # Las mismas consultas (cada estado agrupado por cada dimensión) con cada motor de uyquery;
+    # columns() deja cargados el cubo y el índice o la tabla Arrow antes de medir
+    store = uydata.ProcurementStore(path, ipc_path=None)
+    queries = [(a, [d], {**f, "contract_year": y} if y else f) for a, f, y in states for d in uydata.PIVOT_DIMENSIONS]
+    for name in uyquery.BACKENDS:
+        engine = uyquery.open_backend(store, name)
+        for ambito in (*uydata.AMBITOS, None):
+            engine.columns(ambito)
+        results[f"consultas_{name}"], _ = _timed(lambda: [engine.aggregate(*q) for q in queries], repeat)
+
+    def figures():
+        figs = []
+        for series in yearly:
+            figs.append(uyapp.donut_figure(42.0, ["Uruguay", "Otros"], ["#669bbc", "#003049"]))
+            figs.append(uyapp.frequency_figure(series, height=220))
+            figs.append(uyapp.amount_figure(series))
+        figs += [uyapp.pivot_table_figure(table) for table in tables]
+        return figs
+    results["figuras"], figs = _timed(figures, repeat)
+    results["serializacion"], _ = _timed(lambda: [fig.to_json() for fig in figs], repeat)
+    return results
+
+
+# Lote con un país y un tipo de contrato que la base no tiene, para probar la unión de
+# categorías al incorporarlo
+def novel_batch(rows, rng, start=0):
+    batch = generate_batch(rows, rng, start).to_pandas()
+    batch.loc[:rows // 10, "operation_country_name"] = "Venezuela"
+    batch.loc[:rows // 10, "contract_type"] = "Leasing"
+    return pa.Table.from_pandas(batch, preserve_index=False)
+
+
+def _plain(frame):
+    return frame.astype({c: object for c in frame.select_dtypes("category").columns})
+
+
+# Comprueba que los motores de uyquery den los mismos resultados (agregados, opciones de
+# los filtros y rango de años) en estados de filtros al azar de las tres páginas
+def check_backends(store, queries=120, seed=0):
+    rng = np.random.default_rng(seed)
+    engines = [uyquery.open_backend(store, name) for name in uyquery.BACKENDS]
+    pages = [("nacional", {"operation_country_name": "Uruguay"}, None),
+             ("exterior", {}, {"operation_country_name": "Uruguay"}),
+             (None, {}, None)]
+    failures = []
+    for i in range(queries):
+        ambito, base, exclude = pages[i % len(pages)]
+        reference = engines[0]
+        filters = dict(base)
+        lo, hi = reference.year_bounds(ambito, filters, exclude)
+        if rng.random() < 0.5:
+            lo = int(rng.integers(lo, hi + 1))
+            hi = int(rng.integers(lo, hi + 1))
+            filters["contract_year"] = (lo, hi)
+        for column in uydata.FILTER_COLUMNS:
+            if column in base or column not in reference.columns(ambito) or rng.random() < 0.6:
+                continue
+            if column == "mismo_pais":
+                filters[column] = False
+            elif column == "operation_country_name" and rng.random() < 0.3:
+                filters[column] = uydata.MERCOSUR_COUNTRIES
+            else:
+                options = reference.values(ambito, column, filters, exclude)
+                if options:
+                    filters[column] = options[int(rng.integers(len(options)))]
+        group_by = list(uydata.PIVOT_DIMENSIONS)[int(rng.integers(len(uydata.PIVOT_DIMENSIONS)))]
+        expected = (reference.aggregate(ambito, [group_by], filters, exclude),
+                    reference.values(ambito, "contract_type", filters, exclude),
+                    reference.year_bounds(ambito, filters, exclude))
+        for engine in engines[1:]:
+            try:
+                pd.testing.assert_frame_equal(_plain(engine.aggregate(ambito, [group_by], filters, exclude)),
+                                              _plain(expected[0]), check_exact=False)
+                values = engine.values(ambito, "contract_type", filters, exclude)
+                assert values == expected[1], f"opciones {values} != {expected[1]}"
+                bounds = engine.year_bounds(ambito, filters, exclude)
+                assert bounds == expected[2], f"años {bounds} != {expected[2]}"
+            except (AssertionError, pa.ArrowException) as exc:
+                failures.append(f"motor {engine.name} / {ambito} {filters} por {group_by}: {exc}")
+    return failures
+
+
+# Comprueba que incorporar un lote con refresh() deja los mismos cubos (valores y tipos)
+# que cargar el dataset completo desde cero, con el parquet único y con el particionado.
+# Sobre la base actualizada también compara los motores de consultas.
+def check_refresh(data_dir, rows=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    failures = []
+    with tempfile.TemporaryDirectory(dir=data_dir) as tmp:
+        single = os.path.join(tmp, "base.parquet")
+        partitioned = os.path.join(tmp, "base")
+        batch = os.path.join(tmp, "lote.parquet")
+        pq.write_table(generate_batch(rows, rng), single)
+        pq.write_table(novel_batch(rows // 10, rng, rows), batch)
+        uydata.write_partitioned(single, partitioned)
+        for path in (single, partitioned):
+            store = uydata.ProcurementStore(path, ipc_path=None)
+            for ambito in (*uydata.AMBITOS, None):
+                store.index(ambito)
+            uydata.ingest_batch(batch, path)
+            store.refresh(force=True)
+            fresh = uydata.ProcurementStore(path, ipc_path=None)
+            for ambito in (*uydata.AMBITOS, None):
+                try:
+                    pd.testing.assert_frame_equal(store.cube(ambito), fresh.cube(ambito), check_exact=False)
+                except AssertionError as exc:
+                    failures.append(f"refresh {os.path.basename(path)} / {ambito}: {exc}")
+            failures += check_backends(store, seed=seed)
+    return failures
+
+
+def _parse_size(text):
+    if text in SIZES:
+        return SIZES[text]
+    scale = {"k": 1_000, "M": 1_000_000}.get(text[-1])
+    return int(float(text[:-1]) * scale) if scale else int(text)
+
+
+# Compara contra la línea base; devuelve las etapas que empeoraron más que el umbral
+def compare(current, baseline, threshold):
+    regressions = []
+    for rows, stages in current.items():
+        for stage, seconds in stages.items():
+            before = baseline.get(rows, {}).get(stage)
+            if before is None:
+                continue
+            ratio = seconds / before if before > 0 else float("inf")
+            flag = "REGRESIÓN" if ratio > 1 + threshold else ""
+            print(f"{rows:>12} {stage:<16} {before:10.4f}s -> {seconds:10.4f}s  x{ratio:5.2f} {flag}", file=sys.stderr)
+            if flag:
+                regressions.append((rows, stage, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de las etapas de uyapp con datos sintéticos")
+    parser.add_argument("--sizes", nargs="+", default=["100k", "1M"], help="Tamaños: 100k 1M 10M 50M o N")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--data-dir", default=".uybench", help="Dónde guardar los parquet generados")
+    parser.add_argument("--output", default="-", help="Archivo JSON de resultados ('-' para stdout)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Guarda los resultados como línea base")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Tolerancia antes de marcar regresión")
+    parser.add_argument("--verificar", action="store_true",
+                        help="Solo comprueba que coincidan refresh() y carga completa, y los motores de consultas")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    if args.verificar:
+        failures = check_refresh(args.data_dir)
+        for failure in failures:
+            print(failure, file=sys.stderr)
+        print(f"Verificación: {len(failures)} diferencias", file=sys.stderr)
+        return 1 if failures else 0
+    current = {}
+    for size in args.sizes:
+        rows = _parse_size(size)
+        path = os.path.join(args.data_dir, f"sintetico_{rows}.parquet")
+        if not os.path.exists(path):
+            print(f"Generando {rows:,} filas en {path}", file=sys.stderr)
+            generate(path, rows)
+        print(f"Midiendo {rows:,} filas", file=sys.stderr)
+        current[str(rows)] = run(path, args.repeat)
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": current,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            f.write(text)
+        return 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        if compare(current, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1112 @@
+import argparse
+import collections
+import concurrent.futures
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pandas.api.types import union_categoricals
+
+import uyperf
+
+logger = logging.getLogger(__name__)
+
+# Archivo parquet único o directorio particionado (contract_year=.../ambito=...)
+DATA_PATH = os.environ.get("UY_DATA_PATH", "uy_procurements.parquet")
+
+# Cubo pre-agregado en formato Arrow IPC que los procesos mapean en memoria (opcional)
+IPC_PATH = os.environ.get("UY_IPC_PATH")
+
+# Ámbito de la operación: en Uruguay o en el exterior (incluye país desconocido)
+AMBITOS = ("nacional", "exterior")
+
+# Columnas que usan las páginas; el resto del archivo no se lee
+COLUMNS = [
+    "contract_year",
+    "operation_country_name",
+    "awarded_firm_country_name",
+    "contract_type",
+    "operation_type_name",
+    "economic_sector_name",
+    "status",
+    "idb_amount",
+]
+
+# Columnas de baja cardinalidad que se mantienen como diccionario / categóricas
+CATEGORY_COLUMNS = [
+    "operation_country_name",
+    "awarded_firm_country_name",
+    "contract_type",
+    "operation_type_name",
+    "economic_sector_name",
+    "status",
+]
+
+COUNTRY_COLUMNS = ["awarded_firm_country_name", "operation_country_name"]
+
+MERCOSUR_COUNTRIES = ["Argentina", "Bolivia", "Brazil", "Paraguay"]
+
+
+def is_partitioned(path=DATA_PATH):
+    return os.path.isdir(path)
+
+
+# Directorio de lotes incrementales de un parquet único (uy_procurements_deltas/)
+def delta_dir(path=DATA_PATH):
+    return os.path.splitext(path)[0] + "_deltas"
+
+
+def _visible(name):
+    return not name.startswith((".", "_"))
+
+
+# Archivos que forman el dataset: el parquet único más sus lotes, o todos los
+# parquet del directorio particionado (se ignoran los que empiezan con "." o "_")
+def data_files(path=DATA_PATH):
+    if is_partitioned(path):
+        root, files = path, []
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(d for d in dirnames if _visible(d))
+            files += [os.path.join(dirpath, f) for f in sorted(filenames) if _visible(f) and f.endswith(".parquet")]
+        return files
+    deltas = delta_dir(path)
+    if not os.path.isdir(deltas):
+        return [path]
+    return [path] + [os.path.join(deltas, f) for f in sorted(os.listdir(deltas)) if _visible(f) and f.endswith(".parquet")]
+
+
+# Huella de cada archivo del dataset (tamaño y fecha de modificación)
+def fingerprint(path=DATA_PATH):
+    fingerprints = {}
+    for f in data_files(path):
+        stat = os.stat(f)
+        fingerprints[f] = (stat.st_size, stat.st_mtime_ns)
+    return fingerprints
+
+
+# Versión de contenido del dataset, derivada de las huellas de sus archivos. Los nombres
+# van relativos a la raíz del dataset (la carpeta del parquet único o el directorio
+# particionado), así la versión no depende de cómo se escribió la ruta.
+def dataset_version(fingerprints, path=DATA_PATH):
+    root = path if is_partitioned(path) else os.path.dirname(os.path.abspath(path))
+    relative = {os.path.relpath(os.path.abspath(f), root): stat for f, stat in fingerprints.items()}
+    payload = json.dumps(sorted(relative.items())).encode()
+    return hashlib.sha1(payload).hexdigest()[:12]
+
+
+# Dataset Arrow sobre los archivos indicados (todos por defecto); en el directorio
+# particionado las columnas contract_year y ambito salen de la ruta al estilo Hive
+def open_dataset(path=DATA_PATH, dictionary=(), files=None):
+    fmt = ds.ParquetFileFormat(read_options=ds.ParquetReadOptions(dictionary_columns=list(dictionary)))
+    if not is_partitioned(path):
+        return ds.dataset(files if files is not None else data_files(path), format=fmt)
+    if files is None:
+        return ds.dataset(path, format=fmt, partitioning="hive")
+    return ds.dataset(files, format=fmt, partitioning="hive", partition_base_dir=path)
+
+
+# Expresión de filtro que se empuja al lector (particiones y estadísticas de row groups)
+def dataset_filter(years=None, ambito=None, partitioned=True):
+    expr = None
+    if years is not None:
+        expr = (ds.field("contract_year") >= years[0]) & (ds.field("contract_year") <= years[1])
+    if ambito is not None and partitioned:
+        by_ambito = ds.field("ambito") == ambito
+        expr = by_ambito if expr is None else expr & by_ambito
+    return expr
+
+
+def _is_text(field):
+    return pa.types.is_string(field.type) or pa.types.is_large_string(field.type)
+
+
+# Lee solo las columnas necesarias, con las de baja cardinalidad codificadas como diccionario.
+# Sobre un directorio particionado solo se abren las particiones que cumplen el filtro.
+# files limita la lectura a esos archivos (por ejemplo, los lotes nuevos).
+def read_table(path=DATA_PATH, columns=COLUMNS, years=None, ambito=None, files=None):
+    if files is not None or is_partitioned(path) or os.path.isdir(delta_dir(path)):
+        schema = open_dataset(path, files=files).schema
+        present = [c for c in columns if c in schema.names]
+        dictionary = [c for c in CATEGORY_COLUMNS if c in present and _is_text(schema.field(c))]
+        dataset = open_dataset(path, dictionary, files)
+        return dataset.to_table(columns=present, filter=dataset_filter(years, ambito, is_partitioned(path)))
+    schema = pq.read_schema(path)
+    present = [c for c in columns if c in schema.names]
+    dictionary = [c for c in CATEGORY_COLUMNS if c in present and _is_text(schema.field(c))]
+    return pq.read_table(path, columns=present, read_dictionary=dictionary,
+                         filters=dataset_filter(years, ambito, partitioned=False))
+
+
+# Normaliza los países sobre los valores únicos del diccionario, no fila por fila.
+# Ambas columnas de país comparten categorías para poder compararlas entre sí.
+def normalize_countries(df):
+    present = [c for c in COUNTRY_COLUMNS if c in df.columns]
+    if not present:
+        return df
+    for col in present:
+        if not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    raw = pd.Index(pd.concat([df[col].cat.categories.to_series() for col in present]).unique())
+    normalized = raw.astype(str).str.strip().str.title()
+    categories = pd.Index(sorted(normalized.unique()))
+    lookup = dict(zip(raw, categories.get_indexer(normalized)))
+    for col in present:
+        old = df[col].cat.categories
+        remap = np.array([lookup[v] for v in old] + [-1], dtype=np.int32)
+        codes = remap[df[col].cat.codes.to_numpy()]
+        df[col] = pd.Categorical.from_codes(codes, categories=categories)
+    return df
+
+
+# Ordena alfabéticamente las categorías para que agrupaciones y opciones salgan ordenadas
+def sort_categories(df):
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype) and not df[col].cat.categories.is_monotonic_increasing:
+            df[col] = df[col].cat.reorder_categories(df[col].cat.categories.sort_values())
+    return df
+
+
+# Huella en memoria del DataFrame y estimación de la misma tabla con columnas object
+def memory_report(df):
+    actual = df.memory_usage(deep=True, index=False)
+    as_object = {}
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            counts = np.bincount(series.cat.codes.to_numpy() + 1, minlength=len(series.cat.categories) + 1)
+            sizes = np.array([sys.getsizeof(None)] + [sys.getsizeof(str(v)) for v in series.cat.categories])
+            as_object[col] = int(8 * len(series) + counts @ sizes)
+        else:
+            as_object[col] = int(actual[col])
+    return {
+        "rows": len(df),
+        "bytes_before": int(sum(as_object.values())),
+        "bytes_after": int(actual.sum()),
+        "columns": {col: {"before": as_object[col], "after": int(actual[col])} for col in df.columns},
+    }
+
+
+# Máscara del ámbito sobre países ya normalizados
+def ambito_mask(df, ambito):
+    nacional = (df["operation_country_name"] == "Uruguay").to_numpy()
+    return nacional if ambito == "nacional" else ~nacional
+
+
+# Carga la base proyectada y normalizada, y registra la huella en memoria.
+# years=(desde, hasta) y ambito ("nacional" / "exterior") se empujan al lector.
+@uyperf.timed("carga")
+def read_procurements(path=DATA_PATH, columns=COLUMNS, years=None, ambito=None, files=None):
+    table = read_table(path, columns, years, ambito, files)
+    df = table.to_pandas()
+    df = sort_categories(normalize_countries(df))
+    if ambito is not None and not is_partitioned(path) and "operation_country_name" in df.columns:
+        df = df[ambito_mask(df, ambito)].reset_index(drop=True)
+    if "contract_year" in df.columns and pd.api.types.is_integer_dtype(df["contract_year"]):
+        df["contract_year"] = pd.to_numeric(df["contract_year"], downcast="integer")
+    report = memory_report(df)
+    df.attrs["memory"] = report
+    logger.info("Cargadas %s filas de %s: %.1f MB en memoria (%.1f MB como object)",
+                f"{report['rows']:,}", path, report["bytes_after"] / 1e6, report["bytes_before"] / 1e6)
+    return df
+
+
+# Filas normalizadas de cada ámbito pedido. El parquet único se lee y normaliza una sola
+# vez y se reparte con ambito_mask (trae todos los ámbitos aunque se pida uno); en el
+# directorio particionado cada ámbito lee solo sus particiones.
+def read_ambitos(path=DATA_PATH, ambitos=AMBITOS, columns=COLUMNS, years=None, files=None):
+    if is_partitioned(path):
+        return {a: read_procurements(path, columns, years, a, files) for a in ambitos}
+    df = read_procurements(path, columns, years, files=files)
+    if "operation_country_name" not in df.columns:
+        return {a: df for a in AMBITOS}
+    frames = {}
+    for ambito in AMBITOS:
+        frame = df[ambito_mask(df, ambito)].reset_index(drop=True)
+        frame.attrs["memory"] = memory_report(frame)
+        frames[ambito] = frame
+    return frames
+
+
+# Dimensiones del cubo de contratos (año × país × tipo × operación × sector × estado × banderas)
+CUBE_DIMENSIONS = [
+    "contract_year",
+    "operation_country_name",
+    "contract_type",
+    "operation_type_name",
+    "economic_sector_name",
+    "status",
+    "es_uruguaya",
+    "mismo_pais",
+]
+
+
+# Construye el cubo: cantidad de contratos y suma de idb_amount por combinación de dimensiones
+@uyperf.timed("cubo")
+def build_cube(df):
+    keys = df[[c for c in CUBE_DIMENSIONS if c in df.columns]].copy()
+    if "awarded_firm_country_name" in df.columns:
+        keys["es_uruguaya"] = (df["awarded_firm_country_name"] == "Uruguay").to_numpy()
+        if "operation_country_name" in df.columns:
+            keys["mismo_pais"] = (df["operation_country_name"] == df["awarded_firm_country_name"]).to_numpy()
+    keys["contratos"] = np.ones(len(df), dtype=np.int64)
+    if "idb_amount" in df.columns:
+        keys["monto"] = df["idb_amount"].to_numpy()
+    dims = [c for c in CUBE_DIMENSIONS if c in keys.columns]
+    cube = keys.groupby(dims, observed=True, dropna=False, sort=True).sum().reset_index()
+    logger.info("Cubo de %s combinaciones a partir de %s filas", f"{len(cube):,}", f"{len(df):,}")
+    return cube
+
+
+# Concatena tablas con las mismas columnas; las categóricas se unen con union_categoricals,
+# porque pd.concat las pasa a texto cuando sus categorías difieren
+def concat_frames(frames):
+    frames = list(frames)
+    columns = {}
+    for col in frames[0].columns:
+        parts = [f[col] for f in frames]
+        if all(isinstance(p.dtype, pd.CategoricalDtype) for p in parts):
+            columns[col] = union_categoricals(parts, ignore_order=True)
+        else:
+            columns[col] = pd.concat(parts, ignore_index=True)
+    return sort_categories(pd.DataFrame(columns))
+
+
+# Suma al cubo existente el cubo de un lote nuevo (que puede traer categorías nuevas)
+def merge_cubes(cube, delta):
+    dims = [c for c in CUBE_DIMENSIONS if c in cube.columns]
+    merged = concat_frames([cube, delta])
+    return merged.groupby(dims, observed=True, dropna=False, sort=True).sum().reset_index()
+
+
+# Dimensiones por las que se puede agrupar la tabla pivot, con su etiqueta
+PIVOT_DIMENSIONS = {
+    "operation_country_name": "País de la Operación",
+    "economic_sector_name": "Sector Económico",
+    "contract_year": "Año de Contrato",
+    "operation_type_name": "Tipo de Operación",
+}
+
+PIVOT_MEASURES = ["contratos", "contratos_uy", "pct_contratos_uy", "monto", "monto_uy", "pct_monto_uy"]
+
+# Medidas aditivas (los porcentajes se recalculan a partir de ellas)
+SUM_MEASURES = ["contratos", "contratos_uy", "monto", "monto_uy"]
+
+
+# Agrega porcentajes a un resumen con contratos / monto totales y uruguayos
+def _add_percentages(summary):
+    summary["pct_contratos_uy"] = summary["contratos_uy"] / summary["contratos"] * 100
+    summary["pct_monto_uy"] = summary["monto_uy"] / summary["monto"] * 100
+    return summary
+
+
+# Tabla pivot en una sola pasada vectorizada. Acepta el cubo (columnas contratos / monto /
+# es_uruguaya) o filas de contratos (awarded_firm_country_name / idb_amount). Devuelve
+# medidas numéricas; el formato queda para la visualización.
+@uyperf.timed("agregacion")
+def pivot_summary(frame, rows=("operation_country_name",)):
+    rows = [rows] if isinstance(rows, str) else list(rows)
+    if "contratos" in frame.columns:
+        counts = frame["contratos"].to_numpy()
+    else:
+        counts = np.ones(len(frame), dtype=np.int64)
+    if "es_uruguaya" in frame.columns:
+        es_uy = frame["es_uruguaya"].to_numpy(dtype=bool)
+    else:
+        es_uy = (frame["awarded_firm_country_name"] == "Uruguay").to_numpy()
+    amount = (frame["monto"] if "monto" in frame.columns else frame["idb_amount"]).to_numpy(dtype=np.float64)
+    measures = frame[rows].copy()
+    measures["contratos"] = counts
+    measures["contratos_uy"] = np.where(es_uy, counts, 0)
+    measures["monto"] = amount
+    measures["monto_uy"] = np.where(es_uy, amount, 0.0)
+    if rows:
+        summary = measures.groupby(rows, observed=True, sort=True).sum().reset_index()
+    else:
+        summary = pd.DataFrame({col: [measures[col].sum()] for col in measures.columns})
+    return _add_percentages(summary)[rows + PIVOT_MEASURES]
+
+
+# Totales y porcentajes a partir de las sumas de las medidas
+def _totals(sums):
+    pct_contratos = sums["contratos_uy"] / sums["contratos"] * 100 if sums["contratos"] > 0 else 0
+    pct_monto = sums["monto_uy"] / sums["monto"] * 100 if sums["monto"] > 0 else 0
+    return {
+        "contratos": int(sums["contratos"]),
+        "contratos_uy": int(sums["contratos_uy"]),
+        "pct_contratos_uy": float(pct_contratos),
+        "monto": float(sums["monto"]),
+        "monto_uy": float(sums["monto_uy"]),
+        "pct_monto_uy": float(pct_monto),
+    }
+
+
+# Fila de totales de un resumen de pivot_summary
+def pivot_totals(summary):
+    return _totals(summary[SUM_MEASURES].sum())
+
+
+# Serie anual (pivot_summary por contract_year) con sumas acumuladas de cada medida: los
+# totales de cualquier rango de años salen de dos búsquedas binarias y la serie del
+# rango, de un corte, sin volver a recorrer las filas. Sin la columna de año (datasets
+# que no la traen) la serie es una sola fila con el total.
+class YearSeries:
+    def __init__(self, yearly, year_column="contract_year"):
+        self.yearly = yearly.reset_index(drop=True)
+        self.has_years = year_column in self.yearly.columns
+        self.years = self.yearly[year_column].to_numpy() if self.has_years else np.zeros(len(self.yearly))
+        self.cumulative = {m: np.concatenate([[0], np.cumsum(self.yearly[m].to_numpy())]) for m in SUM_MEASURES}
+        self.nbytes = int(self.yearly.memory_usage(deep=True).sum()) + sum(c.nbytes for c in self.cumulative.values())
+
+    def _bounds(self, lo, hi):
+        if not self.has_years:
+            return 0, len(self.years)
+        start = 0 if lo is None else int(np.searchsorted(self.years, lo, side="left"))
+        stop = len(self.years) if hi is None else int(np.searchsorted(self.years, hi, side="right"))
+        return start, max(start, stop)
+
+    # Filas de la serie para los años entre lo y hi (inclusive)
+    def between(self, lo=None, hi=None):
+        start, stop = self._bounds(lo, hi)
+        return self.yearly.iloc[start:stop].reset_index(drop=True)
+
+    # Totales del rango, con el mismo formato que pivot_totals
+    def totals(self, lo=None, hi=None):
+        start, stop = self._bounds(lo, hi)
+        return _totals({m: c[stop] - c[start] for m, c in self.cumulative.items()})
+
+
+# Ordena el resumen por una dimensión o medida y devuelve solo las filas de una página.
+# Las dimensiones categóricas se ordenan por etiqueta (categorías ya ordenadas) y los
+# porcentajes sin definir van al final.
+@uyperf.timed("pagina_pivot")
+def pivot_page(summary, sort_by, descending=False, page=0, page_size=50):
+    ordered = summary.sort_values(sort_by, ascending=not descending, kind="stable", na_position="last")
+    start = page * page_size
+    return ordered.iloc[start:start + page_size]
+
+
+# Columnas filtrables desde la barra lateral (además del año)
+FILTER_COLUMNS = [
+    "operation_country_name",
+    "contract_type",
+    "operation_type_name",
+    "economic_sector_name",
+    "status",
+    "mismo_pais",
+]
+
+
+# Índice de filtros construido una vez: un bitmap empaquetado por valor de cada columna
+# filtrable. Los filtros se combinan con & / | sobre bitmaps y la tabla se selecciona una
+# única vez al final, sin copias intermedias. La tabla no se copia ni se reordena: si
+# está ordenada por año (el cubo de un ámbito lo está) un rango de años es un tramo
+# contiguo; si no (el cubo completo, un ámbito tras otro), se compara año por año.
+# Las columnas categóricas usan sus propios códigos (int8, vistas sobre la copia Arrow
+# mapeada) en lugar de volver a factorizarlas.
+class FilterIndex:
+    def __init__(self, frame, columns=FILTER_COLUMNS, year_column="contract_year"):
+        self.year_column = year_column if year_column in frame.columns else None
+        if self.year_column is not None:
+            self.years = frame[year_column].to_numpy()
+            self.years_sorted = bool(pd.Index(self.years).is_monotonic_increasing)
+        self.frame = frame
+        self.size = len(frame)
+        self.codes = {}
+        self.uniques = {}
+        self.bitmaps = {}
+        for col in columns:
+            if col not in frame.columns:
+                continue
+            if isinstance(frame[col].dtype, pd.CategoricalDtype):
+                codes, uniques = frame[col].cat.codes.to_numpy(), frame[col].cat.categories
+            else:
+                codes, uniques = pd.factorize(frame[col], sort=True)
+                codes = pd.to_numeric(codes, downcast="integer")
+            self.codes[col] = codes
+            self.uniques[col] = uniques
+            self.bitmaps[col] = {code: self._pack(codes == code) for code in range(-1, len(uniques))}
+
+    def _pack(self, mask):
+        return np.packbits(mask)
+
+    # Todas las filas
+    def all(self):
+        return self._pack(np.ones(self.size, dtype=bool))
+
+    # Filas cuyo valor en la columna está entre los indicados
+    def equals(self, column, values):
+        values = [values] if np.isscalar(values) else list(values)
+        bits = np.zeros_like(self.all())
+        for code in self.uniques[column].get_indexer(values):
+            if code >= 0:
+                bits |= self.bitmaps[column][code]
+        return bits
+
+    # Filas cuyo valor en la columna no es ninguno de los indicados (incluye nulos)
+    def excludes(self, column, values):
+        return ~self.equals(column, values)
+
+    # Filas con año de contrato dentro del rango cerrado [lo, hi]
+    def year_range(self, lo, hi):
+        if not self.years_sorted:
+            return self._pack((self.years >= lo) & (self.years <= hi))
+        mask = np.zeros(self.size, dtype=bool)
+        mask[np.searchsorted(self.years, lo, side="left"):np.searchsorted(self.years, hi, side="right")] = True
+        return self._pack(mask)
+
+    # Posiciones de las filas seleccionadas por un bitmap
+    def rows(self, bits):
+        return np.flatnonzero(np.unpackbits(bits, count=self.size))
+
+    # Valores no nulos presentes en la selección, ordenados (opciones de los filtros)
+    def values(self, column, bits):
+        codes = np.unique(self.codes[column][self.rows(bits)])
+        return self.uniques[column].take(codes[codes >= 0]).tolist()
+
+    # Año mínimo y máximo de la selección
+    def year_bounds(self, bits):
+        years = self.years[self.rows(bits)]
+        years = years[~pd.isna(years)]
+        return (int(years.min()), int(years.max())) if len(years) else (None, None)
+
+    # Tabla de la selección, materializada una única vez
+    def take(self, bits):
+        with uyperf.stage("seleccion", self.size) as s:
+            table = self.frame.take(self.rows(bits))
+            s.rows_out = len(table)
+        return table
+
+    # Selección de un estado de filtros completo: {columna: valor o lista} y rango de años
+    def select(self, filters=None, years=None):
+        bits = self.all()
+        for column, value in (filters or {}).items():
+            bits &= self.equals(column, value)
+        if years is not None and self.year_column is not None:
+            bits &= self.year_range(*years)
+        return bits
+
+
+SNAPSHOT_KEY = b"uy_procurements"
+
+
+# Escribe el cubo de cada ámbito (uno a continuación del otro, ordenado por año para que
+# FilterIndex use tramos contiguos sin reordenarlo) como archivo Arrow IPC sin compresión,
+# con los tramos de filas de cada ámbito y la versión del dataset en los metadatos. Se
+# reemplaza de forma atómica.
+def _write_ipc_file(dest, cubes, version):
+    cubes = [c.sort_values("contract_year", kind="stable", ignore_index=True)
+             if "contract_year" in c.columns and not c["contract_year"].is_monotonic_increasing else c
+             for c in cubes]
+    bounds = np.cumsum([0] + [len(c) for c in cubes]).tolist()
+    meta = {"contenido": "cubo", "version": version, "ambitos": {a: bounds[i:i + 2] for i, a in enumerate(AMBITOS)}}
+    table = pa.Table.from_pandas(concat_frames(cubes), preserve_index=False).combine_chunks()
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), SNAPSHOT_KEY: json.dumps(meta)})
+    tmp = dest + ".tmp"
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, dest)
+
+
+# Exporta los cubos de cada ámbito a un archivo Arrow IPC (las filas no hacen falta: las
+# páginas consultan solo el cubo)
+def write_ipc(dest, path=DATA_PATH):
+    files = fingerprint(path)
+    cubes = [build_cube(f) for f in read_ambitos(path, files=list(files)).values()]
+    version = dataset_version(files, path)
+    _write_ipc_file(dest, cubes, version)
+    logger.info("Cubo Arrow IPC de %s escrito en %s (versión %s)", path, dest, version)
+
+
+# Columna Arrow como serie de pandas sin copiar el buffer cuando es posible:
+# numéricas sin nulos y categóricas sin nulos (índices del diccionario como códigos)
+def _zero_copy_series(column):
+    array = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+    if array.null_count == 0 and pa.types.is_dictionary(array.type) and pa.types.is_signed_integer(array.type.index_type):
+        categories = pd.Index(array.dictionary.to_pandas())
+        codes = array.indices.to_numpy(zero_copy_only=True)
+        return pd.Series(pd.Categorical.from_codes(codes, categories=categories, validate=False), copy=False)
+    if array.null_count == 0 and (pa.types.is_integer(array.type) or pa.types.is_floating(array.type)):
+        return pd.Series(array.to_numpy(zero_copy_only=True), copy=False)
+    return array.to_pandas()
+
+
+# Cubo Arrow IPC mapeado en memoria: las páginas leen vistas sobre el mapa, y la memoria
+# física la comparten todos los procesos a través del page cache
+class ArrowSnapshot:
+    def __init__(self, path):
+        self.path = path
+        self.cubes = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        self.meta = json.loads(self.cubes.schema.metadata.get(SNAPSHOT_KEY, b"{}"))
+        self.version = self.meta.get("version")
+
+    # Cubo de un ámbito como tabla Arrow (sin copia); None es la tabla completa
+    def cube_arrow(self, ambito):
+        if ambito is None:
+            return self.cubes
+        start, stop = self.meta["ambitos"][ambito]
+        return self.cubes.slice(start, stop - start)
+
+    # Cubo de un ámbito como DataFrame de vistas sobre el mapa (solo se copian las columnas
+    # con nulos y las booleanas, que Arrow guarda como bits)
+    def cube(self, ambito):
+        table = self.cube_arrow(ambito)
+        return pd.DataFrame({name: _zero_copy_series(table.column(name)) for name in table.column_names}, copy=False)
+
+
+# Abre la copia Arrow IPC si existe y corresponde a la versión indicada del dataset
+def open_snapshot(path, version):
+    if not path or not os.path.exists(path):
+        return None
+    snapshot = ArrowSnapshot(path)
+    if snapshot.meta.get("contenido") != "cubo":
+        logger.info("La copia Arrow %s tiene el formato anterior (filas); se ignora hasta regenerarla", path)
+        return None
+    if snapshot.version != version:
+        logger.info("La copia Arrow %s es de otra versión del dataset; se ignora", path)
+        return None
+    return snapshot
+
+
+# Estructuras derivadas del dataset (cubo e índice por ámbito), con actualización
+# incremental: refresh() compara las huellas de los archivos y, si solo aparecieron
+# lotes nuevos, lee únicamente esos lotes y suma sus cubos a los ya cargados. Si un archivo
+# existente cambió o desapareció, se descarta todo y se recarga al pedirlo.
+# Con ipc_path, si la copia Arrow corresponde a la versión actual se usa en su lugar.
+class ProcurementStore:
+    def __init__(self, path=DATA_PATH, refresh_interval=10.0, ipc_path=IPC_PATH):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.ipc_path = ipc_path
+        self.files = fingerprint(path)
+        self.version = dataset_version(self.files, path)
+        self.rejected = None
+        self.snapshot = self._open_snapshot(self.version)
+        self.checked_at = time.monotonic()
+        self.cubes = {}
+        self.indexes = {}
+        self._lock = threading.RLock()
+
+    # Cubo de un ámbito; el completo (None) es la copia Arrow entera o se arma con los de
+    # cada ámbito. Las filas solo sirven para construir los cubos y no se conservan; del
+    # parquet único se leen todos los ámbitos de una vez y se arman sus cubos.
+    def cube(self, ambito=None):
+        with self._lock:
+            if ambito not in self.cubes:
+                if self.snapshot is not None:
+                    self.cubes[ambito] = self.snapshot.cube(ambito)
+                elif ambito is None:
+                    self.cubes[None] = concat_frames(self.cube(a) for a in AMBITOS)
+                else:
+                    for loaded, frame in read_ambitos(self.path, [ambito], files=list(self.files)).items():
+                        if loaded not in self.cubes:
+                            self.cubes[loaded] = build_cube(frame)
+            return self.cubes[ambito]
+
+    # Índice de filtros sobre el cubo de un ámbito
+    def index(self, ambito=None):
+        with self._lock:
+            if ambito not in self.indexes:
+                cube = self.cube(ambito)
+                with uyperf.stage("indice", len(cube)):
+                    self.indexes[ambito] = FilterIndex(cube)
+            return self.indexes[ambito]
+
+    # Copia Arrow para la versión indicada. Un archivo descartado (de otra versión o con el
+    # formato anterior) no se vuelve a mapear hasta que cambie el archivo o la versión.
+    def _open_snapshot(self, version):
+        try:
+            stat = os.stat(self.ipc_path) if self.ipc_path else None
+        except OSError:
+            stat = None
+        if stat is None:
+            return None
+        stamp = (stat.st_size, stat.st_mtime_ns, version)
+        if stamp == self.rejected:
+            return None
+        snapshot = open_snapshot(self.ipc_path, version)
+        self.rejected = stamp if snapshot is None else None
+        return snapshot
+
+    # Incorpora los lotes nuevos; devuelve True si cambió la versión
+    def refresh(self, force=False):
+        with self._lock:
+            if not force and time.monotonic() - self.checked_at < self.refresh_interval:
+                return False
+            self.checked_at = time.monotonic()
+            current = fingerprint(self.path)
+            if current == self.files:
+                # Una copia Arrow regenerada para esta versión reemplaza la memoria privada
+                if self.snapshot is None and self.ipc_path:
+                    self.snapshot = self._open_snapshot(self.version)
+                    if self.snapshot is not None:
+                        self.cubes, self.indexes = {}, {}
+                return False
+            added = [f for f in current if f not in self.files]
+            snapshot = self._open_snapshot(dataset_version(current, self.path))
+            if snapshot is not None or any(current.get(f) != stat for f, stat in self.files.items()):
+                logger.info("Dataset %s modificado; se recarga", self.path)
+                self.cubes, self.indexes = {}, {}
+            else:
+                # Solo se leen los lotes nuevos y se suman a los cubos ya armados
+                cubes = {a: c for a, c in self.cubes.items() if a is not None}
+                deltas = read_ambitos(self.path, list(cubes), files=added) if cubes else {}
+                for ambito in cubes:
+                    cubes[ambito] = merge_cubes(cubes[ambito], build_cube(deltas[ambito]))
+                self.cubes, self.indexes = cubes, {}
+                logger.info("Incorporados %d lotes nuevos de %s", len(added), self.path)
+            self.files = current
+            self.version = dataset_version(current, self.path)
+            self.snapshot = snapshot
+            return True
+
+
+# Caché LRU de resultados ya calculados (KPIs y gráficos serializados), acotada por
+# cantidad de entradas y por tamaño aproximado, con contadores de aciertos y fallos
+class ResultCache:
+    def __init__(self, max_entries=512, max_bytes=128_000_000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        with self._lock:
+            if key in self.entries:
+                self.bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.bytes += size
+            while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self.entries), "bytes": self.bytes, "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+# Agrega la columna de ámbito a un lote, normalizando el país igual que normalize_countries
+def _with_ambito(batch):
+    country = batch.column("operation_country_name")
+    if pa.types.is_dictionary(country.type):
+        country = country.cast(country.type.value_type)
+    nacional = pc.equal(pc.utf8_title(pc.utf8_trim_whitespace(country)), "Uruguay")
+    ambito = pc.if_else(pc.fill_null(nacional, False), AMBITOS[0], AMBITOS[1])
+    return batch.append_column("ambito", ambito)
+
+
+# Convierte el parquet único al dataset particionado por año de contrato y ámbito,
+# leyendo por lotes para no cargar el archivo completo en memoria
+def write_partitioned(source, dest, batch_size=1_000_000, basename_template="part-{i}.parquet"):
+    parquet = pq.ParquetFile(source)
+    schema = parquet.schema_arrow.append(pa.field("ambito", pa.string()))
+    partitioning = ds.partitioning(pa.schema([schema.field("contract_year"), schema.field("ambito")]), flavor="hive")
+    batches = (_with_ambito(batch) for batch in parquet.iter_batches(batch_size=batch_size))
+    ds.write_dataset(batches, dest, schema=schema, format="parquet", partitioning=partitioning,
+                     basename_template=basename_template, existing_data_behavior="overwrite_or_ignore")
+    logger.info("Dataset particionado escrito en %s", dest)
+
+
+# Agrega un lote de contratos al dataset. En el directorio particionado se escribe en
+# sus particiones; junto al parquet único, en el directorio de lotes. Los archivos se
+# preparan aparte y se mueven al final para que los lectores nunca vean uno a medias.
+def ingest_batch(source, path=DATA_PATH):
+    stamp = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    if is_partitioned(path):
+        staging = tempfile.mkdtemp(prefix="_ingesta-", dir=path)
+        try:
+            write_partitioned(source, staging, basename_template=f"delta-{stamp}-{{i}}.parquet")
+            for dirpath, _, filenames in os.walk(staging):
+                target = os.path.join(path, os.path.relpath(dirpath, staging))
+                for name in filenames:
+                    os.makedirs(target, exist_ok=True)
+                    os.replace(os.path.join(dirpath, name), os.path.join(target, name))
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+    else:
+        deltas = delta_dir(path)
+        os.makedirs(deltas, exist_ok=True)
+        staging = os.path.join(deltas, f"_delta-{stamp}.parquet")
+        shutil.copyfile(source, staging)
+        os.replace(staging, os.path.join(deltas, f"delta-{stamp}.parquet"))
+    logger.info("Lote %s incorporado a %s (versión %s)", source, path, dataset_version(fingerprint(path), path))
+
+
+# Resultados precalculados de las páginas (opcional). Sin UY_PRECOMPUTED_PATH se busca
+# junto al dataset, en <nombre>_precalculado.
+PRECOMPUTED_PATH = os.environ.get("UY_PRECOMPUTED_PATH")
+
+# Valor de un filtro sin restringir, como en los selectores de la app
+ALL = "Todos"
+
+# Filtros de cada página que se precalculan. El año no está: las series anuales permiten
+# responder cualquier rango sumando los años que abarca.
+PRECOMPUTED_FILTERS = {
+    "nacional": ["contract_type", "operation_type_name", "economic_sector_name"],
+    "exterior": ["contract_type", "operation_type_name", "economic_sector_name",
+                 "operation_country_name", "mismo_pais"],
+    "pivot": ["contract_type", "status", "operation_type_name", "economic_sector_name"],
+}
+
+
+def precomputed_dir(path=DATA_PATH):
+    return os.path.splitext(path)[0] + "_precalculado"
+
+
+# Huella del manifiesto (cambia cada vez que se vuelve a precalcular); None si no existe
+def precomputed_stamp(directory):
+    try:
+        return os.stat(os.path.join(directory, "manifest.json")).st_mtime_ns
+    except OSError:
+        return None
+
+
+# Filas del cubo que ve cada página antes de los filtros de la barra lateral, en el
+# mismo orden que FilterIndex para que las sumas coincidan con las de la app
+def _page_frame(store, page):
+    if page == "pivot":
+        return store.index(None).frame
+    frame = store.index(page).frame
+    country = frame["operation_country_name"]
+    return frame[country == "Uruguay"] if page == "nacional" else frame[country != "Uruguay"]
+
+
+# Columna con el valor de un filtro en los archivos precalculados (texto; "Todos" si no se
+# filtra). Va aparte de la columna agrupada porque la tabla pivot puede agrupar por ella.
+def _key(column):
+    return "filtro_" + column
+
+
+_precompute_store = None
+
+
+def _init_precompute(path, ipc_path):
+    global _precompute_store
+    _precompute_store = ProcurementStore(path, ipc_path=ipc_path)
+
+
+# Tarea de un proceso: resumen de la página para un subconjunto de filtros fijados (los
+# demás valen "Todos"). operation_country_name puede ser un país o el grupo Mercosur y
+# mismo_pais solo se usa para quitar las observaciones con el mismo país.
+def _precompute_task(page, fixed, group_by, mercosur=False):
+    frame = _page_frame(_precompute_store, page)
+    if "mismo_pais" in fixed:
+        frame = frame[~frame["mismo_pais"].to_numpy(dtype=bool)]
+    if mercosur:
+        frame = frame[frame["operation_country_name"].isin(MERCOSUR_COUNTRIES)]
+    keys = [c for c in fixed if c not in ("mismo_pais", group_by)
+            and not (mercosur and c == "operation_country_name")]
+    summary = pivot_summary(frame, rows=keys + [group_by])
+    for col in PRECOMPUTED_FILTERS[page]:
+        if col not in fixed:
+            summary[_key(col)] = ALL
+        elif col == "mismo_pais":
+            summary[_key(col)] = str(False)
+        elif mercosur and col == "operation_country_name":
+            summary[_key(col)] = "Mercosur"
+        else:
+            summary[_key(col)] = summary[col].astype(str)
+    return summary[[_key(c) for c in PRECOMPUTED_FILTERS[page]] + [group_by] + PIVOT_MEASURES]
+
+
+# Todas las combinaciones de filtros de una página, como argumentos de _precompute_task
+def _precompute_tasks(page, columns):
+    filters = [c for c in PRECOMPUTED_FILTERS[page] if c in columns]
+    groups = [d for d in (PIVOT_DIMENSIONS if page == "pivot" else ["contract_year"]) if d in columns]
+    tasks = []
+    for mask in range(2 ** len(filters)):
+        fixed = [c for i, c in enumerate(filters) if mask >> i & 1]
+        for group_by in groups:
+            tasks.append((page, fixed, group_by, False))
+            if "operation_country_name" in fixed:
+                tasks.append((page, fixed, group_by, True))
+    return tasks
+
+
+def _write_parquet(df, dest, version):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), SNAPSHOT_KEY: version.encode()})
+    tmp = dest + ".tmp"
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, dest)
+
+
+# Calcula en varios procesos los KPIs, las series anuales de las páginas de país y los
+# resúmenes de la tabla pivot para todas las combinaciones de filtros, y los escribe en
+# parquet. El manifiesto se escribe al final con la versión del dataset de origen.
+def precompute(dest, path=DATA_PATH, ipc_path=IPC_PATH, workers=None):
+    version = dataset_version(fingerprint(path), path)
+    columns = set(open_dataset(path).schema.names) | {"mismo_pais"}
+    tasks = [t for page in PRECOMPUTED_FILTERS for t in _precompute_tasks(page, columns)]
+    results = collections.defaultdict(list)
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_precompute,
+                                                initargs=(path, ipc_path)) as pool:
+        for (page, _, group_by, _), summary in zip(tasks, pool.map(_precompute_task, *zip(*tasks))):
+            results[page, group_by].append(summary)
+    os.makedirs(dest, exist_ok=True)
+    files = []
+    for (page, group_by), parts in results.items():
+        summary = pd.concat(parts, ignore_index=True)
+        keys = [_key(c) for c in PRECOMPUTED_FILTERS[page]]
+        summary[keys] = summary[keys].astype("category")
+        name = f"pivot_{group_by}.parquet" if page == "pivot" else f"serie_{page}.parquet"
+        _write_parquet(summary, os.path.join(dest, name), version)
+        files.append(name)
+        if page != "pivot":
+            kpis = summary.groupby(keys, observed=True)[SUM_MEASURES].sum().reset_index()
+            _write_parquet(_add_percentages(kpis), os.path.join(dest, f"kpi_{page}.parquet"), version)
+            files.append(f"kpi_{page}.parquet")
+    manifest = {"version": version, "source": path, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "tasks": len(tasks), "files": sorted(files)}
+    tmp = os.path.join(dest, "manifest.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(dest, "manifest.json"))
+    logger.info("Precalculadas %d agrupaciones de %s en %s (%.1fs, versión %s)",
+                len(tasks), path, dest, time.perf_counter() - start, version)
+
+
+# Resultados precalculados de un directorio: las tablas se leen al pedirlas y se agrupan
+# por combinación de filtros para responder cada consulta con un acceso al diccionario
+class PrecomputedResults:
+    def __init__(self, directory):
+        with open(os.path.join(directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        self.directory = directory
+        self.version = manifest["version"]
+        self.files = set(manifest["files"])
+        self.tables = {}
+        self._lock = threading.Lock()
+
+    def _table(self, name, page):
+        with self._lock:
+            if name not in self.tables:
+                frame = sort_categories(pd.read_parquet(os.path.join(self.directory, name)))
+                keys = [_key(c) for c in PRECOMPUTED_FILTERS[page]]
+                groups = frame.groupby(keys, observed=True, sort=False).indices
+                self.tables[name] = (frame, groups)
+            return self.tables[name]
+
+    def _lookup(self, name, page, filters, group_by):
+        frame, groups = self._table(name, page)
+        key = tuple(str(filters.get(col, ALL)) for col in PRECOMPUTED_FILTERS[page])
+        rows = groups.get(key, np.array([], dtype=np.intp))
+        return frame[[group_by] + PIVOT_MEASURES].take(rows).reset_index(drop=True)
+
+    def has(self, page, group_by="contract_year"):
+        name = f"pivot_{group_by}.parquet" if page == "pivot" else f"serie_{page}.parquet"
+        return name in self.files
+
+    # Serie anual de una página de país para los filtros de la app (incluido el rango de años)
+    def series(self, page, filters):
+        series = self._lookup(f"serie_{page}.parquet", page, filters, "contract_year")
+        if "contract_year" in filters:
+            lo, hi = filters["contract_year"]
+            years = series["contract_year"]
+            series = series[(years >= lo) & (years <= hi)].reset_index(drop=True)
+        return series
+
+    # Resumen de la tabla pivot agrupado por una dimensión, como pivot_summary
+    def pivot(self, group_by, filters):
+        return self._lookup(f"pivot_{group_by}.parquet", "pivot", filters, group_by)
+
+
+def open_precomputed(directory):
+    if precomputed_stamp(directory) is None:
+        return None
+    return PrecomputedResults(directory)
+
+
+# Resultados precalculados vigentes de un directorio: se vuelven a abrir cuando cambia el
+# manifiesto (una nueva corrida de precalcular)
+class PrecomputedSource:
+    def __init__(self, directory):
+        self.directory = directory
+        self.stamp = None
+        self.results = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        stamp = precomputed_stamp(self.directory)
+        with self._lock:
+            if stamp != self.stamp:
+                self.stamp, self.results = stamp, open_precomputed(self.directory)
+            return self.results
+
+
+# Registro de uso: los últimos estados de filtros pedidos por página, para saber cuáles
+# conviene precalentar. Se guarda en JSON (junto al dataset, salvo UY_USAGE_PATH) cada
+# tantos registros, así sobrevive a los reinicios. El archivo lo comparten todos los
+# procesos: cada uno suma sus registros nuevos a lo que ya hay, bajo un bloqueo.
+USAGE_PATH = os.environ.get("UY_USAGE_PATH")
+
+
+def usage_path(path=DATA_PATH):
+    return os.path.splitext(path)[0] + "_uso.json"
+
+
+class UsageLog:
+    def __init__(self, path, max_entries=1000, flush_every=20):
+        self.path = path
+        self.flush_every = flush_every
+        self.entries = collections.deque(self._read(), maxlen=max_entries)
+        self.pending = []
+        self._lock = threading.Lock()
+
+    def _read(self):
+        if not self.path or not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            logger.warning("Registro de uso %s ilegible; se empieza de cero", self.path)
+            return []
+
+    def record(self, page, state):
+        with self._lock:
+            entry = [page, state]
+            self.entries.append(entry)
+            self.pending.append(entry)
+            if len(self.pending) % self.flush_every == 0:
+                self._flush()
+
+    # Relee el archivo con el bloqueo tomado, le agrega los registros pendientes de este
+    # proceso y lo reemplaza; lo escrito pasa a ser el registro en memoria. Si no se pudo
+    # escribir, los pendientes se conservan para el próximo intento.
+    def _flush(self):
+        if not self.path:
+            self.pending = []
+            return
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(self.path + ".lock", "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                entries = collections.deque(self._read(), maxlen=self.entries.maxlen)
+                entries.extend(self.pending)
+                with open(tmp, "w") as f:
+                    json.dump(list(entries), f)
+                os.replace(tmp, self.path)
+        except OSError as exc:
+            del self.pending[:-self.entries.maxlen]
+            logger.warning("No se pudo guardar el registro de uso en %s: %s", self.path, exc)
+            return
+        self.pending = []
+        self.entries = entries
+
+    # Estados más pedidos recientemente: [(página, estado, veces)], con los rangos como tuplas
+    def frequent(self, n=10):
+        with self._lock:
+            counts = collections.Counter(json.dumps(entry) for entry in self.entries)
+        frequent = []
+        for text, count in counts.most_common(n):
+            page, state = json.loads(text)
+            frequent.append((page, {k: tuple(v) if isinstance(v, list) else v for k, v in state.items()}, count))
+        return frequent
+
+
+# Tareas en segundo plano con su estado y tiempo, para mostrar el progreso. Las tareas
+# corren en un pool de hilos; quien las encola no espera su resultado.
+class BackgroundTasks:
+    def __init__(self, workers=2, name="tareas"):
+        self.pool = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix=name)
+        self.tasks = []
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def submit(self, label, fn, *args):
+        task = {"tarea": label, "estado": "pendiente", "segundos": None}
+        with self._lock:
+            self.tasks.append(task)
+        self.pool.submit(self._run, task, fn, *args)
+
+    def _run(self, task, fn, *args):
+        task["estado"] = "en curso"
+        start = time.perf_counter()
+        try:
+            with uyperf.stage("precalentamiento"):
+                fn(*args)
+            task["estado"] = "lista"
+        except Exception:
+            logger.exception("Falló la tarea en segundo plano %s", task["tarea"])
+            task["estado"] = "error"
+        task["segundos"] = round(time.perf_counter() - start, 3)
+        logger.info("Tarea %s: %s en %.2fs", task["tarea"], task["estado"], task["segundos"])
+
+    # Tareas terminadas (listas o con error) y total encoladas
+    def progress(self):
+        with self._lock:
+            tasks = list(self.tasks)
+        return sum(t["estado"] in ("lista", "error") for t in tasks), len(tasks)
+
+    def status(self):
+        with self._lock:
+            return [dict(t) for t in self.tasks]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Utilidades de datos de UY_PROCUREMENT")
+    commands = parser.add_subparsers(dest="command", required=True)
+    particionar = commands.add_parser("particionar", help="Convierte el parquet único al dataset particionado")
+    particionar.add_argument("source", nargs="?", default="uy_procurements.parquet")
+    particionar.add_argument("dest", nargs="?", default="uy_procurements")
+    ingestar = commands.add_parser("ingestar", help="Agrega lotes de contratos al dataset")
+    ingestar.add_argument("batches", nargs="+")
+    ingestar.add_argument("--path", default=DATA_PATH)
+    ingestar.add_argument("--arrow", default=IPC_PATH, help="Regenera también el cubo Arrow IPC")
+    exportar = commands.add_parser("exportar-arrow", help="Escribe el cubo pre-agregado en Arrow IPC")
+    exportar.add_argument("dest", nargs="?", default=IPC_PATH or "uy_procurements.arrow")
+    exportar.add_argument("--path", default=DATA_PATH)
+    precalcular = commands.add_parser("precalcular", help="Precalcula KPIs, series y tablas pivot de la app")
+    precalcular.add_argument("dest", nargs="?", default=None, help="Por defecto <dataset>_precalculado")
+    precalcular.add_argument("--path", default=DATA_PATH)
+    precalcular.add_argument("--arrow", default=IPC_PATH, help="Cubo Arrow IPC que comparten los procesos")
+    precalcular.add_argument("--workers", type=int, default=None, help="Procesos (por defecto, uno por CPU)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.command == "particionar":
+        write_partitioned(args.source, args.dest)
+    elif args.command == "ingestar":
+        for batch in args.batches:
+            ingest_batch(batch, args.path)
+        if args.arrow:
+            write_ipc(args.arrow, args.path)
+    elif args.command == "exportar-arrow":
+        write_ipc(args.dest, args.path)
+    elif args.command == "precalcular":
+        precompute(args.dest or PRECOMPUTED_PATH or precomputed_dir(args.path), args.path, args.arrow, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import collections
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+# Destinos opcionales: log estructurado (JSON por línea) y archivo de texto para Prometheus.
+# Con varios procesos, "{pid}" en UY_PERF_PROM da un archivo por proceso.
+LOG_PATH = os.environ.get("UY_PERF_LOG")
+PROM_PATH = os.environ.get("UY_PERF_PROM")
+
+# Sin UY_PERF ni destinos configurados la instrumentación queda desactivada: stage()
+# devuelve un contexto vacío compartido y timed() solo agrega una comprobación.
+_enabled = bool(os.environ.get("UY_PERF") or LOG_PATH or PROM_PATH)
+
+HISTORY = 200
+
+_local = threading.local()
+_lock = threading.Lock()
+_history = collections.deque(maxlen=HISTORY)
+_totals = {}
+
+
+def enabled():
+    return _enabled
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL = _NullStage()
+
+
+# Filas de una tabla (DataFrame o tabla Arrow); None para cualquier otra cosa
+def _rows(value):
+    shape = getattr(value, "shape", None)
+    return shape[0] if shape else None
+
+
+# Etapa medida: tiempo de reloj, filas de entrada y salida, y pico de memoria de Python
+# (tracemalloc). El pico es aproximado cuando varias sesiones corren a la vez.
+class Stage:
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.seconds = None
+        self.peak_bytes = 0
+
+    def __enter__(self):
+        stack = _stack()
+        if stack and tracemalloc.is_tracing():
+            parent = stack[-1]
+            parent.peak_bytes = max(parent.peak_bytes, tracemalloc.get_traced_memory()[1] - parent._base)
+        stack.append(self)
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            self._base = tracemalloc.get_traced_memory()[0]
+        else:
+            self._base = 0
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._start
+        if tracemalloc.is_tracing():
+            self.peak_bytes = max(self.peak_bytes, tracemalloc.get_traced_memory()[1] - self._base)
+        stack = _stack()
+        stack.pop()
+        if stack:
+            stack[-1].peak_bytes = max(stack[-1].peak_bytes, self.peak_bytes)
+        _record(self)
+        return False
+
+    def as_dict(self):
+        return {"stage": self.name, "seconds": round(self.seconds, 6), "rows_in": self.rows_in,
+                "rows_out": self.rows_out, "peak_bytes": self.peak_bytes}
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _record(stage):
+    run = getattr(_local, "run", None)
+    if run is not None:
+        run["stages"].append(stage.as_dict())
+    with _lock:
+        total = _totals.setdefault(stage.name, {"count": 0, "seconds": 0.0, "rows_out": 0, "peak_bytes": 0})
+        total["count"] += 1
+        total["seconds"] += stage.seconds
+        total["rows_out"] += stage.rows_out or 0
+        total["peak_bytes"] = max(total["peak_bytes"], stage.peak_bytes)
+
+
+# Contexto para medir una etapa; con la instrumentación desactivada no hace nada
+def stage(name, rows_in=None):
+    if not _enabled:
+        return _NULL
+    return Stage(name, rows_in)
+
+
+# Decorador: mide la función como etapa, con filas de entrada (primer argumento) y salida
+def timed(name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Stage(name, _rows(args[0]) if args else None) as s:
+                result = fn(*args, **kwargs)
+                s.rows_out = _rows(result)
+                return result
+        return wrapper
+    return decorator
+
+
+# Agrupa las etapas de un rerun de una página (o de un fragmento suyo) y al terminar las
+# publica. Dentro de otro run no abre uno nuevo: las etapas van al que ya está abierto.
+@contextlib.contextmanager
+def run(page):
+    if not _enabled or getattr(_local, "run", None) is not None:
+        yield
+        return
+    _local.run = current = {"page": page, "started": time.time(), "stages": []}
+    try:
+        with Stage("rerun"):
+            yield
+    finally:
+        _local.run = None
+        with _lock:
+            _history.append(current)
+        _publish(current)
+
+
+# Últimos reruns registrados en este proceso (más reciente al final)
+def history(page=None):
+    with _lock:
+        runs = list(_history)
+    return [r for r in runs if page is None or r["page"] == page]
+
+
+def _publish(current):
+    if LOG_PATH:
+        with _lock, open(LOG_PATH, "a") as f:
+            f.write(json.dumps(current) + "\n")
+    if PROM_PATH:
+        write_prometheus(PROM_PATH)
+
+
+# Métricas acumuladas por etapa en formato de texto de Prometheus (node_exporter textfile)
+def prometheus_text():
+    with _lock:
+        totals = {name: dict(values) for name, values in _totals.items()}
+    lines = [
+        "# HELP uyapp_stage_seconds_total Tiempo de reloj acumulado por etapa.",
+        "# TYPE uyapp_stage_seconds_total counter",
+    ]
+    lines += [f'uyapp_stage_seconds_total{{stage="{n}"}} {t["seconds"]:.6f}' for n, t in sorted(totals.items())]
+    lines += ["# HELP uyapp_stage_runs_total Ejecuciones por etapa.", "# TYPE uyapp_stage_runs_total counter"]
+    lines += [f'uyapp_stage_runs_total{{stage="{n}"}} {t["count"]}' for n, t in sorted(totals.items())]
+    lines += ["# HELP uyapp_stage_rows_out_total Filas producidas por etapa.", "# TYPE uyapp_stage_rows_out_total counter"]
+    lines += [f'uyapp_stage_rows_out_total{{stage="{n}"}} {t["rows_out"]}' for n, t in sorted(totals.items())]
+    lines += ["# HELP uyapp_stage_peak_bytes Pico de memoria de Python observado por etapa.",
+              "# TYPE uyapp_stage_peak_bytes gauge"]
+    lines += [f'uyapp_stage_peak_bytes{{stage="{n}"}} {t["peak_bytes"]}' for n, t in sorted(totals.items())]
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    path = path.replace("{pid}", str(os.getpid()))
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+
+
+if _enabled:
+    tracemalloc.start()
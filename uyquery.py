@@ -0,0 +1,174 @@
+import os
+import threading
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import uydata
+import uyperf
+
+# Motor de consultas de las páginas: "pandas" (índice de bitmaps sobre el cubo en memoria)
+# o "arrow" (pyarrow.compute sobre el cubo en formato columnar, multihilo)
+BACKEND = os.environ.get("UY_BACKEND", "pandas")
+
+# Todas las consultas reciben los mismos argumentos:
+#   filters: {columna: valor o lista de valores}; "contract_year" lleva el rango (desde, hasta)
+#   exclude: {columna: valor o lista} que se quitan (las filas con nulo se conservan)
+# y aggregate devuelve group_by + medidas (PIVOT_MEASURES por defecto), ordenado por
+# group_by, con el mismo formato que uydata.pivot_summary.
+
+
+def _as_list(value):
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _split_years(filters):
+    filters = dict(filters or {})
+    return filters, filters.pop("contract_year", None)
+
+
+# Une tablas cuyos esquemas pueden diferir en los tipos (diccionario en una y texto en otra,
+# string / large_string, anchos de índice): una columna que es diccionario en alguna tabla
+# y texto en otra se decodifica en todas y se vuelve a codificar después de unirlas. Al
+# final todos los tramos comparten un diccionario, como exige group_by.
+def _concat_tables(tables):
+    mixed = [name for name in tables[0].column_names
+             if len({pa.types.is_dictionary(t.schema.field(name).type) for t in tables}) > 1]
+    for name in mixed:
+        tables = [t.set_column(t.schema.get_field_index(name), name,
+                               t[name].cast(t.schema.field(name).type.value_type))
+                  if pa.types.is_dictionary(t.schema.field(name).type) else t for t in tables]
+    table = pa.concat_tables(tables, promote_options="permissive")
+    for name in mixed:
+        table = table.set_column(table.schema.get_field_index(name), name, pc.dictionary_encode(table[name]))
+    return table.unify_dictionaries()
+
+
+# Consultas con el índice de bitmaps del store (FilterIndex) y pivot_summary de pandas
+class PandasBackend:
+    name = "pandas"
+
+    def __init__(self, store):
+        self.store = store
+
+    def columns(self, ambito=None):
+        return list(self.store.index(ambito).frame.columns)
+
+    def _selection(self, index, filters, exclude):
+        filters, years = _split_years(filters)
+        bits = index.select(filters, years)
+        for column, values in (exclude or {}).items():
+            bits &= index.excludes(column, values)
+        return bits
+
+    def aggregate(self, ambito, group_by, filters=None, exclude=None, measures=uydata.PIVOT_MEASURES):
+        index = self.store.index(ambito)
+        rows = index.take(self._selection(index, filters, exclude))
+        return uydata.pivot_summary(rows, group_by)[list(group_by) + list(measures)]
+
+    def values(self, ambito, column, filters=None, exclude=None):
+        index = self.store.index(ambito)
+        return index.values(column, self._selection(index, filters, exclude))
+
+    def year_bounds(self, ambito, filters=None, exclude=None):
+        index = self.store.index(ambito)
+        return index.year_bounds(self._selection(index, filters, exclude))
+
+
+# Consultas con pyarrow.compute sobre el cubo como tabla Arrow. Con la copia Arrow IPC el
+# cubo se lee del mapa en memoria sin pasar por pandas; si no, se convierte una vez por
+# versión del dataset. Solo el resultado agregado (pocas filas) se lleva a pandas.
+class ArrowBackend:
+    name = "arrow"
+
+    def __init__(self, store):
+        self.store = store
+        self.tables = {}
+        self._lock = threading.RLock()
+
+    def _table(self, ambito):
+        with self._lock:
+            key = (self.store.version, ambito)
+            if key not in self.tables:
+                self.tables = {k: t for k, t in self.tables.items() if k[0] == key[0]}
+                if self.store.snapshot is not None:
+                    self.tables[key] = self.store.snapshot.cube_arrow(ambito)
+                elif ambito is None:
+                    self.tables[key] = _concat_tables([self._table(a) for a in uydata.AMBITOS])
+                else:
+                    self.tables[key] = pa.Table.from_pandas(self.store.cube(ambito), preserve_index=False)
+            return self.tables[key]
+
+    def columns(self, ambito=None):
+        return self._table(ambito).column_names
+
+    def _filtered(self, ambito, filters, exclude):
+        filters, years = _split_years(filters)
+        expr = None
+        for column, values in filters.items():
+            term = pc.field(column).isin(_as_list(values))
+            expr = term if expr is None else expr & term
+        for column, values in (exclude or {}).items():
+            term = ~pc.field(column).isin(_as_list(values)) | pc.field(column).is_null()
+            expr = term if expr is None else expr & term
+        if years is not None:
+            term = (pc.field("contract_year") >= years[0]) & (pc.field("contract_year") <= years[1])
+            expr = term if expr is None else expr & term
+        table = self._table(ambito)
+        return table if expr is None else table.filter(expr)
+
+    @uyperf.timed("agregacion_arrow")
+    def aggregate(self, ambito, group_by, filters=None, exclude=None, measures=uydata.PIVOT_MEASURES):
+        group_by = list(group_by)
+        table = self._filtered(ambito, filters, exclude)
+        es_uy = pc.fill_null(table["es_uruguaya"], False)
+        work = pa.table({
+            **{col: table[col] for col in group_by},
+            "contratos": table["contratos"],
+            "contratos_uy": pc.if_else(es_uy, table["contratos"], 0),
+            "monto": table["monto"],
+            "monto_uy": pc.if_else(es_uy, table["monto"], 0.0),
+        })
+        result = work.group_by(group_by).aggregate([(m, "sum") for m in uydata.SUM_MEASURES])
+        result = result.rename_columns([c.removesuffix("_sum") for c in result.column_names])
+        valid = None
+        for col in group_by:
+            term = pc.is_valid(result[col])
+            valid = term if valid is None else pc.and_(valid, term)
+        if valid is not None:
+            result = result.filter(valid)
+        categorical = [c for c in group_by if pa.types.is_dictionary(result.schema.field(c).type)]
+        for col in categorical:
+            result = result.set_column(result.schema.get_field_index(col), col,
+                                       result[col].cast(result.schema.field(col).type.value_type))
+        if group_by:
+            result = result.sort_by([(col, "ascending") for col in group_by])
+        for name, part, whole in (("pct_contratos_uy", "contratos_uy", "contratos"),
+                                  ("pct_monto_uy", "monto_uy", "monto")):
+            ratio = pc.divide(pc.cast(result[part], pa.float64()), pc.cast(result[whole], pa.float64()))
+            result = result.append_column(name, pc.multiply(ratio, 100.0))
+        summary = result.to_pandas()
+        for col in categorical:
+            summary[col] = summary[col].astype("category")
+        return uydata.sort_categories(summary)[group_by + list(measures)]
+
+    def values(self, ambito, column, filters=None, exclude=None):
+        values = pc.unique(self._filtered(ambito, filters, exclude)[column]).drop_null()
+        if pa.types.is_dictionary(values.type):
+            values = values.cast(values.type.value_type)
+        return sorted(values.to_pylist())
+
+    def year_bounds(self, ambito, filters=None, exclude=None):
+        bounds = pc.min_max(self._filtered(ambito, filters, exclude)["contract_year"])
+        if not bounds["min"].is_valid:
+            return (None, None)
+        return (bounds["min"].as_py(), bounds["max"].as_py())
+
+
+BACKENDS = {"pandas": PandasBackend, "arrow": ArrowBackend}
+
+
+def open_backend(store, name=BACKEND):
+    if name not in BACKENDS:
+        raise ValueError(f"Motor de consultas desconocido: {name} (opciones: {', '.join(BACKENDS)})")
+    return BACKENDS[name](store)